@@ -1,13 +1,18 @@
 import streamlit as st
 import os
 import sys
-from moviepy.editor import VideoFileClip
 
 # ================= 0. PERSISTENCIA =================
 # Asegurar que podemos importar desde src
 if os.getcwd() not in sys.path:
     sys.path.append(os.getcwd())
 from src.session_utils import load_session, save_session
+from src.video_store import CARPETA_VIDEOS, ingestar_video
+from src.video_meta import obtener_metadatos
+from src.video_proxy import programar_previsualizaciones, proxy_disponible, miniatura_en
+from src.analysis_copy import programar_copia_analisis
+from src.watch_ingest import iniciar_vigilancia, vigilante_actual
+from src.batch_ingest import leer_manifiesto, procesar_manifiesto
 
 # Cargar sesión antes de validar login
 load_session()
@@ -183,7 +188,6 @@ st.markdown(
 )
 
 # =============== 4. CONFIGURACIÓN DE CARPETA =================
-CARPETA_VIDEOS = "videos_data"
 if not os.path.exists(CARPETA_VIDEOS):
     os.makedirs(CARPETA_VIDEOS)
 
@@ -214,20 +218,121 @@ with st.form("registro_experimento"):
 
 st.markdown("</div>", unsafe_allow_html=True)
 
+# =============== 5b. CARPETA VIGILADA (INGESTA MASIVA) =================
+with st.expander("📂 Carpeta vigilada (ingesta masiva sin navegador)"):
+    st.caption(
+        "Los videos copiados a esta carpeta se registran automáticamente. "
+        "Opcional: un archivo lateral con el mismo nombre (.json o .csv) con "
+        "id_raton, tratamiento, fecha y responsable."
+    )
+    carpeta_vigilada = st.text_input(
+        "Carpeta a vigilar",
+        value=st.session_state.get("carpeta_vigilada", os.path.join(CARPETA_VIDEOS, "entrada")),
+    )
+    # El vigilante es único por proceso: escribir en el cuadro no lo toca, solo el botón
+    vigilante = vigilante_actual()
+    activo = vigilante is not None and vigilante.activo
+    misma_carpeta = vigilante is not None and vigilante.carpeta == os.path.abspath(carpeta_vigilada)
+    cw1, cw2 = st.columns(2)
+    with cw1:
+        if st.button("▶️ Iniciar vigilancia", disabled=activo and misma_carpeta):
+            st.session_state["carpeta_vigilada"] = carpeta_vigilada
+            save_session()
+            iniciar_vigilancia(carpeta_vigilada)
+            st.rerun()
+    with cw2:
+        if st.button("⏹️ Detener", disabled=not activo):
+            vigilante.detener()
+            st.rerun()
+
+    if activo:
+        st.success(f"👀 Vigilando `{vigilante.carpeta}`")
+        if not misma_carpeta:
+            st.caption("Iniciar la vigilancia de otra carpeta detiene la actual.")
+    filas_estado = vigilante.estado() if vigilante is not None else []
+    if filas_estado:
+        st.dataframe(filas_estado, use_container_width=True)
+
+# =============== 5c. INGESTA POR LOTE (MANIFIESTO) =================
+with st.expander("🗂️ Ingesta por lote (manifiesto CSV)"):
+    st.caption(
+        "Columnas: ruta, id_raton, tratamiento, fecha, inicio, fin (segundos) "
+        "y opcionalmente responsable. Cada video se hashea, indexa y valida en paralelo."
+    )
+    manifiesto = st.file_uploader("Manifiesto del lote", type=["csv"], key="manifiesto_lote")
+    if manifiesto is not None:
+        try:
+            entradas_lote = leer_manifiesto(manifiesto)
+        except Exception as e:
+            st.error(f"Manifiesto inválido: {e}")
+            entradas_lote = []
+
+        if entradas_lote and st.button(f"⚙️ Procesar lote ({len(entradas_lote)} videos)"):
+            filas = [
+                {"ID": e["id_raton"], "Archivo": os.path.basename(str(e["ruta"])), "Estado": "En cola"}
+                for e in entradas_lote
+            ]
+            # Las zonas detectadas viajan con cada fila pero no se muestran en la tabla
+            visibles = lambda: [{k: v for k, v in f.items() if k != "zonas_configuradas"} for f in filas]
+            tabla_lote = st.empty()
+            barra_lote = st.progress(0)
+            tabla_lote.dataframe(visibles(), use_container_width=True)
+            for hechos, (i, resultado) in enumerate(procesar_manifiesto(entradas_lote), start=1):
+                filas[i].update(resultado)
+                tabla_lote.dataframe(visibles(), use_container_width=True)
+                barra_lote.progress(hechos / len(entradas_lote))
+            st.session_state["resultado_lote"] = filas
+            st.success("✅ Lote procesado. Los rangos quedaron guardados para el análisis.")
+
+    # Cargar un experimento del lote como video actual (mismo estado que el editor)
+    listos = [f for f in st.session_state.get("resultado_lote", []) if "ruta_video_actual" in f]
+    if listos:
+        elegido = st.selectbox(
+            "Experimento del lote",
+            range(len(listos)),
+            format_func=lambda i: f"{listos[i]['ID']} · {listos[i]['inicio_recorte']:.0f}-{listos[i]['fin_recorte']:.0f} s",
+        )
+        if st.button("📌 Usar este experimento"):
+            exp = listos[elegido]
+            st.session_state["video_en_edicion"] = exp["ruta_video_actual"]
+            st.session_state["id_raton_actual"] = exp["ID"]
+            st.session_state["ruta_video_actual"] = exp["ruta_video_actual"]
+            st.session_state["inicio_recorte"] = exp["inicio_recorte"]
+            st.session_state["fin_recorte"] = exp["fin_recorte"]
+            if exp.get("zonas_configuradas"):
+                st.session_state["zonas_configuradas"] = exp["zonas_configuradas"]
+            save_session()
+            st.success("✅ Experimento cargado. Continúa en **Configuración Zonas**.")
+
 # =============== 6. PROCESAMIENTO DE LA CARGA =================
 if submitted and video_file is not None:
     if not id_raton:
         st.error("⚠️ Falta el ID del ratón.")
     else:
-        nombre_limpio = f"{id_raton}_{tratamiento}.mp4".replace(" ", "_")
-        ruta_guardado = os.path.join("videos_data", nombre_limpio)
-        
-        with open(ruta_guardado, "wb") as f:
-            f.write(video_file.getbuffer())
-        
+        # Copia por bloques + SHA-256: el archivo se guarda por contenido,
+        # así dos cargas con el mismo ID/tratamiento no se sobrescriben.
+        # Ojo: st.file_uploader ya tiene el video completo en RAM (UploadedFile en memoria),
+        # así que copiar por bloques no baja el pico de memoria de esta vía. Las sesiones
+        # grandes deben entrar por la carpeta vigilada o el manifiesto (leen desde disco).
+        extension = os.path.splitext(video_file.name)[1] or ".mp4"
+        registro = ingestar_video(
+            video_file,
+            extension,
+            id_raton=id_raton,
+            tratamiento=tratamiento,
+            fecha=fecha,
+            responsable=responsable,
+            nombre_original=video_file.name,
+        )
+        ruta_guardado = registro["ruta"]
+        # Proxy 480p y tira de miniaturas en segundo plano
+        programar_previsualizaciones(ruta_guardado)
+
         st.session_state["video_en_edicion"] = ruta_guardado
         st.session_state["id_raton_actual"] = id_raton
         save_session()
+        if registro["duplicado"]:
+            st.info("♻️ Este video ya estaba en el almacén; se reutiliza sin ocupar espacio extra.")
         st.success("✅ Video subido correctamente.")
 
 # =============== 7. EDITOR PERSISTENTE =================
@@ -238,8 +343,8 @@ if "video_en_edicion" in st.session_state:
     st.subheader(f"✂️ Edición del video: {st.session_state['id_raton_actual']}")
 
     try:
-        clip = VideoFileClip(ruta_actual)
-        duracion = clip.duration
+        # Metadatos desde el índice persistente: no se abre el decodificador en cada rerun
+        duracion = obtener_metadatos(ruta_actual)["duracion"]
 
         rango = st.slider(
             "Selecciona el rango de análisis (segundos):",
@@ -252,20 +357,44 @@ if "video_en_edicion" in st.session_state:
 
         start, end = rango
 
-        st.video(ruta_actual, start_time=int(start))
+        # Miniaturas del sprite para ubicar el rango sin decodificar el original
+        mini_inicio = miniatura_en(ruta_actual, start)
+        mini_fin = miniatura_en(ruta_actual, end)
+        if mini_inicio is not None and mini_fin is not None:
+            m1, m2 = st.columns(2)
+            m1.image(mini_inicio, caption=f"Inicio ≈ {start:.0f} s")
+            m2.image(mini_fin, caption=f"Fin ≈ {end:.0f} s")
+
+        # El reproductor usa el proxy ligero cuando ya está generado
+        ruta_proxy = proxy_disponible(ruta_actual)
+        if ruta_proxy is None:
+            programar_previsualizaciones(ruta_actual)
+            st.caption("⏳ Generando previsualización ligera; mientras tanto se muestra el original.")
+        st.video(ruta_proxy or ruta_actual, start_time=int(start))
         st.info(f"⏱️ Se analizará del segundo **{start}** al **{end}**.")
 
+        # Copia intermedia opcional: solo el rango, a la resolución del modelo y GOP corto
+        cc1, cc2 = st.columns([2, 1])
+        with cc1:
+            crear_copia = st.checkbox(
+                "Crear copia de análisis (GOP corto, acelera las páginas 02/03)",
+                value=False,
+            )
+        with cc2:
+            alto_copia = st.selectbox("Resolución de la copia", [480, 720, 1080], index=1)
+
         if st.button("💾 Confirmar recorte y procesar"):
             st.session_state["ruta_video_actual"] = ruta_actual
             st.session_state["inicio_recorte"] = start
             st.session_state["fin_recorte"] = end
             save_session()
+            if crear_copia:
+                programar_copia_analisis(ruta_actual, start, end, alto_copia)
+                st.info("⚙️ La copia de análisis se está generando en segundo plano.")
 
             st.balloons()
             st.success("✅ ¡Datos guardados! Ahora ve a la página **Configuración Zonas**.")
 
-        clip.close()
-
     except Exception as e:
         st.error(f"Error cargando el video para edición: {e}")
 
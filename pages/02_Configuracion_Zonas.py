@@ -1,8 +1,6 @@
 import streamlit as st
-from PIL import Image
 from streamlit_drawable_canvas import st_canvas
 import pandas as pd
-from moviepy.editor import VideoFileClip
 import os
 import sys
 
@@ -10,6 +8,12 @@ import sys
 if os.getcwd() not in sys.path:
     sys.path.append(os.getcwd())
 from src.session_utils import load_session, save_session
+from src.video_meta import obtener_metadatos
+from src.frame_cache import ANCHO_CANVAS, fondo_canvas
+from src.background import fondo_mediana
+from src.maze_detection import detectar_brazos
+from src.zone_templates import guardar_plantilla, zonas_desde_plantilla
+from src.zonas import objeto_canvas_de_zona, poligono_de_objeto_canvas, zona_desde_poligono
 
 # Cargar sesión antes de validar login
 load_session()
@@ -148,21 +152,27 @@ if "ruta_video_actual" not in st.session_state:
 ruta_video = st.session_state["ruta_video_actual"]
 tiempo_inicio = st.session_state.get("inicio_recorte", 0)
 
+tipo_fondo = st.sidebar.radio(
+    "Fondo del canvas",
+    ("Fotograma inicial", "Mediana del rango (sin ratón)"),
+    help="La mediana de varios frames muestreados elimina al ratón de la imagen.",
+)
+
 try:
-    clip = VideoFileClip(ruta_video)
-    ancho_real, alto_real = clip.size
-    frame_array = clip.get_frame(tiempo_inicio)
-    image_original = Image.fromarray(frame_array)
-    clip.close()
+    meta_video = obtener_metadatos(ruta_video)
+    tiempo_fin = st.session_state.get("fin_recorte", meta_video["duracion"])
+    # Fondo y factor de escala cacheados por (video, tiempo): el canvas hace rerun
+    # en cada trazo y no debe volver a decodificar el video.
+    image_display, factor_escala, (ancho_real, alto_real) = fondo_canvas(
+        ruta_video, tiempo_inicio, tiempo_fin,
+        modo="mediana" if tipo_fondo.startswith("Mediana") else "frame",
+    )
 except Exception as e:
     st.error(f"Error al cargar el video: {e}")
     st.stop()
 
 # =============== 6. CÁLCULO DE ESCALA =================
-ANCHO_CANVAS = 800
-factor_escala = ancho_real / ANCHO_CANVAS
-ALTO_CANVAS = int(alto_real / factor_escala)
-image_display = image_original.resize((ANCHO_CANVAS, ALTO_CANVAS))
+ALTO_CANVAS = image_display.height
 
 st.info(
     f"📏 Resolución original: {ancho_real}×{alto_real} px · "
@@ -182,11 +192,79 @@ colores = {
 }
 color_actual = colores.get(tipo_zona_visual, "rgba(148, 163, 184, 0.35)")
 
+herramientas = {
+    "Rectángulo": "rect",
+    "Polígono": "polygon",
+    "Mover / girar": "transform",
+}
+herramienta = st.sidebar.radio(
+    "Herramienta de dibujo",
+    list(herramientas.keys()),
+    help="Polígono: clic para cada vértice y clic derecho para cerrar. "
+         "Mover / girar permite rotar un rectángulo para brazos inclinados.",
+)
+
+def precargar_zonas(zonas_propuestas: list):
+    """Dibuja zonas (resolución original) en el canvas y rellena sus nombres en el editor."""
+    st.session_state["dibujo_inicial_zonas"] = {
+        "version": "4.4.0",
+        "objects": [
+            objeto_canvas_de_zona(z, factor_escala, colores.get(z["Nombre Zona"].rsplit(" ", 1)[0]))
+            for z in zonas_propuestas
+        ],
+    }
+    st.session_state["lista_nombres_zonas"] = [z["Nombre Zona"] for z in zonas_propuestas]
+    # Una clave nueva obliga al canvas a cargar el dibujo inicial
+    st.session_state["version_canvas_zonas"] = st.session_state.get("version_canvas_zonas", 0) + 1
+
+
+# Al abrir un video nuevo se intenta alinear la plantilla del equipo más parecida
+experimento_actual = (ruta_video, tiempo_inicio, tiempo_fin)
+if st.session_state.get("plantilla_revisada") != experimento_actual:
+    st.session_state["plantilla_revisada"] = experimento_actual
+    try:
+        alineada = zonas_desde_plantilla(ruta_video, tiempo_inicio, tiempo_fin)
+    except Exception as e:
+        print(f"[ZONAS] Error alineando plantillas: {e}")
+        alineada = None
+    if alineada:
+        precargar_zonas(alineada["zonas"])
+        st.session_state["plantilla_aplicada"] = alineada
+    else:
+        st.session_state.pop("plantilla_aplicada", None)
+
+if st.session_state.get("plantilla_aplicada"):
+    aplicada = st.session_state["plantilla_aplicada"]
+    st.sidebar.success(
+        f"🧩 Plantilla **{aplicada['plantilla']}** alineada "
+        f"({aplicada['inliers']} puntos, residuo {aplicada['residuo']:.1f} px)."
+    )
+
+# Propuesta automática de brazos y centro sobre el fondo mediana (se puede corregir a mano)
+if st.sidebar.button("🤖 Detectar brazos automáticamente"):
+    try:
+        precargar_zonas(detectar_brazos(*fondo_mediana(ruta_video, tiempo_inicio, tiempo_fin)))
+    except Exception as e:
+        st.sidebar.error(f"No se pudo detectar el laberinto: {e}")
+
+with st.sidebar.expander("🧩 Plantillas de zonas"):
+    nombre_plantilla = st.text_input("Nombre de la plantilla", placeholder="Ej. Rig A - cámara cenital")
+    if st.button("Guardar zonas guardadas como plantilla"):
+        if not st.session_state.get("zonas_configuradas"):
+            st.warning("Primero guarda la configuración final de zonas.")
+        elif not nombre_plantilla:
+            st.warning("Escribe un nombre para la plantilla.")
+        else:
+            fondo_ref, escala_ref = fondo_mediana(ruta_video, tiempo_inicio, tiempo_fin)
+            guardar_plantilla(nombre_plantilla, st.session_state["zonas_configuradas"], fondo_ref, escala_ref)
+            st.success(f"Plantilla '{nombre_plantilla}' guardada.")
+
 st.markdown(
     '<div class="tt-card">'
     '<div class="tt-section-title">🖊️ Dibujo de ROIs sobre el fotograma</div>'
-    '<p>Haz clic y arrastra para dibujar rectángulos sobre el laberinto. '
-    'Puedes cambiar el tipo de zona en el menú lateral.</p>'
+    '<p>Haz clic y arrastra para dibujar rectángulos sobre el laberinto, o usa el modo '
+    'polígono si el video está girado. Puedes cambiar el tipo de zona y la herramienta '
+    'en el menú lateral.</p>'
     '</div>',
     unsafe_allow_html=True,
 )
@@ -201,8 +279,9 @@ canvas_result = st_canvas(
     update_streamlit=True,
     height=ALTO_CANVAS,
     width=ANCHO_CANVAS,
-    drawing_mode="rect",
-    key="canvas_zonas",
+    drawing_mode=herramientas[herramienta],
+    initial_drawing=st.session_state.get("dibujo_inicial_zonas"),
+    key=f"canvas_zonas_{st.session_state.get('version_canvas_zonas', 0)}",
 )
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -236,7 +315,13 @@ if canvas_result.json_data is not None:
             unsafe_allow_html=True,
         )
 
+        objetos_canvas = canvas_result.json_data["objects"]
         datos_visuales = objects[["left", "top", "width", "height"]].copy()
+        datos_visuales["Forma"] = [
+            "Polígono" if o.get("type") == "path" else
+            ("Rectángulo girado" if o.get("angle", 0) else "Rectángulo")
+            for o in objetos_canvas
+        ]
         datos_visuales["Nombre Zona"] = st.session_state["lista_nombres_zonas"]
 
         df_editado = st.data_editor(
@@ -247,6 +332,7 @@ if canvas_result.json_data is not None:
                 "top": st.column_config.NumberColumn("Y (canvas)", disabled=True),
                 "width": "Ancho",
                 "height": "Alto",
+                "Forma": st.column_config.TextColumn("Forma", disabled=True),
                 "Nombre Zona": st.column_config.TextColumn("Nombre", disabled=False),
             },
             key="editor_zonas_auto",
@@ -256,14 +342,20 @@ if canvas_result.json_data is not None:
 
         if st.button("💾 Guardar configuración final"):
             zonas_para_guardar = []
-            for reg in df_editado.to_dict("records"):
-                zona_real = {
-                    "Nombre Zona": reg["Nombre Zona"],
-                    "left": int(reg["left"] * factor_escala),
-                    "top": int(reg["top"] * factor_escala),
-                    "width": int(reg["width"] * factor_escala),
-                    "height": int(reg["height"] * factor_escala),
-                }
+            for i, reg in enumerate(df_editado.to_dict("records")):
+                obj = objetos_canvas[i] if i < len(objetos_canvas) else {}
+                if obj.get("type") == "path" or obj.get("angle", 0):
+                    # Polígonos y rectángulos girados se guardan por vértices (+ caja envolvente)
+                    puntos = poligono_de_objeto_canvas(obj) * factor_escala
+                    zona_real = zona_desde_poligono(reg["Nombre Zona"], puntos)
+                else:
+                    zona_real = {
+                        "Nombre Zona": reg["Nombre Zona"],
+                        "left": int(reg["left"] * factor_escala),
+                        "top": int(reg["top"] * factor_escala),
+                        "width": int(reg["width"] * obj.get("scaleX", 1.0) * factor_escala),
+                        "height": int(reg["height"] * obj.get("scaleY", 1.0) * factor_escala),
+                    }
                 zonas_para_guardar.append(zona_real)
 
             st.session_state["zonas_configuradas"] = zonas_para_guardar
@@ -7,12 +7,26 @@ import time
 import os
 import sys
 import threading
-from moviepy.editor import VideoFileClip
+import contextlib
 
 # ================= 0. PERSISTENCIA =================
 if os.getcwd() not in sys.path:
     sys.path.append(os.getcwd())
 from src.session_utils import load_session, save_session
+from src.video_meta import obtener_metadatos
+from src.frame_index import obtener_indice_frames, abrir_en_tiempo
+from src.video_trim import recortar_video, cargar_info_recorte
+from src.analysis_copy import buscar_copia_analisis
+from src.zonas import CapaZonas, MapaZonas, caja_arena, escalar_zona, poligono_de_zona
+from src.yolo_pipeline import (
+    MAX_LOTE, REFRESCO_K, TAM_ENTRADA_MODELO, PipelineVideo, anotar_deteccion, detectar_simulado, detectar_yolo, tam_lote_auto,
+)
+from src.background import fondo_mediana
+from src.classic_tracker import UMBRAL_DIFERENCIA, DetectorFondo
+from src.live_preview import HZ_PREVIA, VistaPrevia
+from src.model_registry import obtener_modelo
+from src.video_export import ALTO_EXPORTACION, PASO_EXPORTACION, ExportadorVideo, ruta_exportacion
+from src.calibration import cargar_calibracion, listar_calibraciones, normalizar_trayectoria
 
 # Cargar sesión antes de validar login
 load_session()
@@ -69,7 +83,7 @@ def cargar_motores():
         except Exception as e:
             dlc_import_error = f"{type(e).__name__}: {str(e)}"
             
-    # YOLO se carga globalmente pero solo se usa después
+    # YOLO se carga bajo demanda desde el registro de modelos (compartido entre sesiones)
 
 # ================== 1. VERIFICAR LOGIN Y ENTORNO ==================
 if "logged_in" not in st.session_state or not st.session_state.logged_in:
@@ -87,8 +101,6 @@ if not sys.version.startswith("3.11"):
 # ================== 2. CARGAR MOTORES (LAZY) ==================
 cargar_motores()
 
-from ultralytics import YOLO # Importar aquí para que respete la env var anterior
-
 # ================== 2. TEMA CLARO / OSCURO ==================
 if "theme_mode" not in st.session_state:
     st.session_state.theme_mode = "Oscuro"
@@ -252,21 +264,57 @@ with col_cfg:
     
     motor = st.selectbox(
         "Motor de Análisis",
-        ["YOLOv8 (Tiempo Real)", "DeepLabCut SuperAnimal"],
+        ["Sustracción de fondo (Clásico)", "YOLOv8 (Tiempo Real)", "DeepLabCut SuperAnimal"],
         index=0
     )
+    motor_clasico = motor == "Sustracción de fondo (Clásico)"
     
     # Actualizar encabezado ahora que 'motor' existe
-    header_title = "🧠 Análisis con DeepLabCut" if motor == "DeepLabCut SuperAnimal" else "🧠 Análisis con YOLOv8"
+    header_title = {
+        "DeepLabCut SuperAnimal": "🧠 Análisis con DeepLabCut",
+        "YOLOv8 (Tiempo Real)": "🧠 Análisis con YOLOv8",
+    }.get(motor, "🧠 Análisis por Sustracción de Fondo")
     header_placeholder.markdown(
         f'<div class="tt-ia-title">{header_title}</div>',
         unsafe_allow_html=True,
     )
     
-    if motor == "YOLOv8 (Tiempo Real)":
+    if motor_clasico:
+        st.info("⚡ Ratón = blob más grande que difiere del fondo mediana dentro de la arena. Solo CPU.")
+        umbral_fondo = st.slider("Umbral de diferencia (niveles de gris)", 5, 80, UMBRAL_DIFERENCIA)
+        estimar_pose = st.toggle("Estimar nariz/cola por la orientación del blob", value=True)
+        # El motor clásico no usa modelo: lotes grandes, siempre recortado a la arena
+        usar_modelo_real, confianza = False, 0.0
+        tam_lote_usuario, recortar_arena, reducir_entrada = 16, True, False
+        omitir_estaticos, refresco_k, modo_hibrido, intervalo_deteccion = False, REFRESCO_K, False, 1
+    elif motor == "YOLOv8 (Tiempo Real)":
         usar_modelo_real = st.toggle("Usar modelo YOLO real (.pt)", value=False)
         modelo_path = st.text_input("Ruta del modelo (.pt):", "yolov8n.pt")
         confianza = st.slider("Umbral de confianza", 0.0, 1.0, 0.5)
+        tam_lote_usuario = st.number_input(
+            "Frames por lote (0 = automático)", min_value=0, max_value=MAX_LOTE, value=0,
+            help="Varios frames por llamada al modelo; en automático se ajusta a la RAM libre.",
+        )
+        recortar_arena = st.toggle(
+            "Recortar a la arena", value=True,
+            help="Solo se analiza la caja que contiene las zonas (más un margen).",
+        )
+        reducir_entrada = st.toggle(
+            f"Reducir al tamaño de entrada del modelo ({TAM_ENTRADA_MODELO}px)", value=True,
+        )
+        omitir_estaticos = st.toggle(
+            "Omitir frames sin movimiento", value=True,
+            help="Si la arena no cambia, se reutiliza la última detección en lugar de llamar al modelo.",
+        )
+        refresco_k = st.slider(
+            "Inferencia forzada cada K frames", 2, 60, REFRESCO_K, disabled=not omitir_estaticos,
+        )
+        modo_hibrido = st.toggle(
+            "Híbrido detector + seguimiento", value=False,
+            help="El detector corre cada N frames; en medio, flujo óptico propaga la posición "
+                 "y se vuelve a detectar si el seguimiento falla.",
+        )
+        intervalo_deteccion = st.slider("Detectar cada N frames", 2, 30, 5, disabled=not modo_hibrido)
     else:
         # Usamos el estado global
         if st.session_state.get("dlc_device_opt") == "CPU (Forzar)":
@@ -296,6 +344,37 @@ with col_cfg:
                 with st.expander("Ver detalles del error"):
                     st.code(dlc_import_error)
             
+    opciones_rig = ["Sin corrección de lente"] + listar_calibraciones()
+    rig_calibracion = st.selectbox(
+        "Calibración del equipo",
+        opciones_rig,
+        index=opciones_rig.index(st.session_state.get("rig_calibracion"))
+        if st.session_state.get("rig_calibracion") in opciones_rig else 0,
+        help="Corrige la lente y lleva la trayectoria a coordenadas canónicas del laberinto (cm).",
+    )
+    st.session_state["rig_calibracion"] = rig_calibracion
+
+    if motor != "DeepLabCut SuperAnimal":
+        vista_previa = st.toggle(
+            "Vista previa en vivo", value=True,
+            help="Apagada = modo headless: el análisis no dibuja ni envía frames al navegador.",
+        )
+        hz_previa = st.slider("Refrescos de la vista previa por segundo", 1.0, 10.0, HZ_PREVIA, 0.5,
+                              disabled=not vista_previa)
+        exportar_video = st.toggle(
+            "Exportar video anotado (MP4)", value=False,
+            help="Se escribe en segundo plano; si el codificador se atrasa se repite el frame anterior (la duración se conserva) en lugar de frenar el análisis.",
+        )
+        col_alto, col_paso = st.columns(2)
+        alto_exportacion = col_alto.selectbox(
+            "Resolución", [360, 480, 720, 1080], index=[360, 480, 720, 1080].index(ALTO_EXPORTACION),
+            format_func=lambda a: f"{a}p", disabled=not exportar_video,
+        )
+        paso_exportacion = col_paso.number_input(
+            "Exportar 1 de cada N frames", min_value=1, max_value=30, value=PASO_EXPORTACION,
+            disabled=not exportar_video,
+        )
+
     iniciar = st.button("▶️ INICIAR ANÁLISIS")
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -312,22 +391,11 @@ with col_video:
     image_placeholder = st.empty()
     st.markdown("</div>", unsafe_allow_html=True)
 
-# ================== 7. FUNCIÓN GEOMÉTRICA ==================
-def checar_zona(punto_xy, zonas_lista):
-    """
-    Revisa en qué zona cae el punto (x, y) del ratón.
-    Retorna el nombre de la zona o 'Fuera del Laberinto'.
-    """
-    x, y = punto_xy
-    for zona in zonas_lista:
-        x_min = zona["left"]
-        x_max = zona["left"] + zona["width"]
-        y_min = zona["top"]
-        y_max = zona["top"] + zona["height"]
-
-        if x_min <= x <= x_max and y_min <= y <= y_max:
-            return zona["Nombre Zona"]
-    return "Fuera del Laberinto"
+# ================== 7. MAPA DE ZONAS ==================
+# Las zonas se rasterizan una vez a la resolución del video: asignar zona a un
+# punto es un acceso al arreglo y a una trayectoria completa, un gather vectorizado.
+meta_original = obtener_metadatos(ruta_video)
+mapa_zonas = MapaZonas(zonas, meta_original["ancho"], meta_original["alto"])
 
 # ================== 8. BUCLE DE PROCESAMIENTO ==================
 if iniciar:
@@ -374,9 +442,8 @@ if iniciar:
                 # Siempre recortamos si t_end está definido (significa que el usuario pasó por Ingesta)
                 print(f"[DLC] Valores de recorte recibidos: t_start={t_start}, t_end={t_end}")
                 
-                # Cargar el clip para obtener la duración real
-                original_clip = VideoFileClip(video_path)
-                duracion_total = original_clip.duration
+                # Duración real desde el índice de metadatos (sin abrir el decodificador)
+                duracion_total = obtener_metadatos(video_path)["duracion"]
                 
                 # Solo recortamos si el rango es diferente al video completo
                 necesita_recorte = (t_start > 0) or (t_end is not None and t_end < duracion_total - 1)
@@ -386,22 +453,18 @@ if iniciar:
                     if t_end is None:
                         t_end = duracion_total
                     
-                    # Generar nombre temporal para el recorte
-                    base_name = os.path.splitext(os.path.basename(video_path))[0]
-                    trimmed_name = f"{base_name}_trimmed_{int(t_start)}_{int(t_end)}.mp4"
-                    video_para_analizar = os.path.join(dest, trimmed_name)
-                    
-                    if not os.path.exists(video_para_analizar):
-                        subclip = original_clip.subclip(t_start, t_end)
-                        # Usamos codec libx264 rápido para no perder mucha calidad ni tiempo
-                        subclip.write_videofile(video_para_analizar, codec="libx264", audio=False)
-                    else:
-                        print(f"[DLC] Usando recorte existente: {video_para_analizar}")
+                    # Preferimos la copia de análisis (GOP corto) si ya existe para este rango;
+                    # si no, copia de paquetes entre keyframes con libx264 solo como respaldo
+                    info_recorte = buscar_copia_analisis(video_path, t_start, t_end)
+                    if info_recorte is None:
+                        info_recorte = recortar_video(video_path, t_start, t_end, dest)
+                    video_para_analizar = info_recorte["ruta"]
+                    analysis_state["recorte"] = info_recorte
+                    print(f"[DLC] Recorte ({info_recorte.get('modo', 'copia de análisis')}): {video_para_analizar}, "
+                          f"offset de {info_recorte['offset_frames']} frames")
                 else:
                     print(f"[DLC] Sin recorte necesario, analizando video completo")
                 
-                original_clip.close()
-                
                 # 4. Cargar motores y ejecutar
                 cargar_motores()
                 
@@ -483,28 +546,29 @@ if iniciar:
                 bodyparts = df_dlc.columns.get_level_values(1).unique()
                 # Intentar encontrar la nariz o centro
                 rep_bp = 'snout' if 'snout' in bodyparts else bodyparts[0]
-                resultados_data = []
-                cap = cv2.VideoCapture(ruta_video)
-                fps = cap.get(cv2.CAP_PROP_FPS)
-                cap.release()
-                for i, (idx, row) in enumerate(df_dlc.iterrows()):
-                    # El tiempo en el CSV es relativo al recorte. Sumamos 'inicio' para tiempo real.
-                    time_s = (i / fps) + inicio
-                    # Como ya es un recorte físico, no necesitamos filtrar por inicio/fin aquí,
-                    # pero lo dejamos por seguridad si algo falló en el recorte.
-                    if time_s > fin + 0.5: break # Margen de error
-                    x = row[(scorer, rep_bp, 'x')]
-                    y = row[(scorer, rep_bp, 'y')]
-                    if np.isnan(x) or np.isnan(y):
-                        zona_actual = "No detectado"
-                    else:
-                        zona_actual = checar_zona((x, y), zonas)
-                    resultados_data.append({
-                        "Tiempo (s)": time_s,
-                        "Zona": zona_actual,
-                        "x": x,
-                        "y": y
-                    })
+                # Alineación temporal exacta: el frame i del recorte es el frame
+                # frame_base + i del original; los primeros offset_frames son previos al inicio.
+                info_recorte = analysis_state.get("recorte") or cargar_info_recorte(video_usado)
+                frame_base = info_recorte["frame_base"] if info_recorte else 0
+                offset_frames = info_recorte["offset_frames"] if info_recorte else 0
+                escala = info_recorte.get("escala", 1.0) if info_recorte else 1.0
+                pts_original = obtener_indice_frames(ruta_video).pts
+
+                i = np.arange(len(df_dlc))
+                validos = (i >= offset_frames) & (frame_base + i < len(pts_original))
+                tiempos = pts_original[np.minimum(frame_base + i, len(pts_original) - 1)]
+                # Como ya es un recorte físico, no necesitamos filtrar por inicio/fin aquí,
+                # pero lo dejamos por seguridad si algo falló en el recorte.
+                validos &= tiempos <= fin + 0.5  # Margen de error
+                # Coordenadas de vuelta a la resolución original (copia de análisis reducida)
+                xs = df_dlc[(scorer, rep_bp, 'x')].to_numpy(dtype=float)[validos] * escala
+                ys = df_dlc[(scorer, rep_bp, 'y')].to_numpy(dtype=float)[validos] * escala
+                resultados_data = pd.DataFrame({
+                    "Tiempo (s)": tiempos[validos],
+                    "Zona": mapa_zonas.zonas_de_trayectoria(xs, ys),
+                    "x": xs,
+                    "y": ys,
+                })
                 # Mostrar video procesado si existe
                 labeled_video = glob.glob(os.path.join(dest_folder, f"{base_name_usado}*labeled.mp4"))
                 if labeled_video:
@@ -516,7 +580,7 @@ if iniciar:
             st.error(f"Error al cargar resultados de DLC: {e}")
             st.stop()
     else:
-        # --- MODO YOLO (EXISTENTE) ---
+        # --- MOTORES POR FRAME: CLÁSICO (SUSTRACCIÓN DE FONDO) Y YOLO ---
         # Cargar modelo (pose preferido)
         model = None
         if usar_modelo_real:
@@ -526,20 +590,44 @@ if iniciar:
                 if model_target == "yolov8n.pt":  # Sugerir pose si usan el default n
                      st.info("💡 Consejo: Usa un modelo '-pose.pt' para detección postural.")
                 
-                model = YOLO(model_target)
-                st.success(f"Modelo `{model_target}` cargado correctamente.")
+                # Registro del proceso: solo la primera vez se cargan y calientan los pesos
+                model, recien_cargado = obtener_modelo(
+                    model_target,
+                    device="cpu" if st.session_state.get("dlc_device_opt") == "CPU (Forzar)" else None,
+                )
+                st.success(
+                    f"Modelo `{model_target}` cargado correctamente."
+                    if recien_cargado else f"Modelo `{model_target}` listo (ya estaba en memoria)."
+                )
             except Exception as e:
                 st.error(f"Error cargando modelo: {e}")
                 st.stop()
 
-        cap = cv2.VideoCapture(ruta_video)
-        fps = cap.get(cv2.CAP_PROP_FPS)
+        meta_video = obtener_metadatos(ruta_video)
+        fps = meta_video["fps"]
         if fps == 0: fps = 30 # Fallback
         
-        frame_total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-        # Saltamos al segundo de inicio del recorte
-        cap.set(cv2.CAP_PROP_POS_MSEC, inicio * 1000)
+        frame_total = meta_video["frames"]
+
+        indice_frames = obtener_indice_frames(ruta_video)
+        copia_analisis = buscar_copia_analisis(ruta_video, inicio, fin)
+        if copia_analisis:
+            # Copia de análisis: arranca justo en el inicio y ya está a la resolución del modelo
+            cap = cv2.VideoCapture(copia_analisis["ruta"])
+            n_frame = copia_analisis["frame_base"]
+            escala = copia_analisis["escala"]
+            st.caption(f"⚡ Usando copia de análisis {copia_analisis['alto']}p (GOP corto).")
+        else:
+            # Saltamos al frame exacto del inicio del recorte (keyframe previo + avance mínimo)
+            cap, n_frame, _ = abrir_en_tiempo(ruta_video, inicio, indice_frames)
+            escala = 1.0
+        # Zonas en la resolución del video que se decodifica (solo para dibujar)
+        zonas_dibujo = [
+            (z["Nombre Zona"], poligono_de_zona(escalar_zona(z, 1.0 / escala)).astype(np.int32))
+            for z in zonas
+        ]
+        # Contornos y nombres se rasterizan una vez; por frame solo se mezclan sus píxeles
+        capa_zonas = CapaZonas(zonas_dibujo)
 
         barra_progreso = st.progress(0)
         
@@ -547,98 +635,134 @@ if iniciar:
         resultados_data = [] 
         
         tiempo_limite = max(fin - inicio, 0.1)  # evitar división entre 0
-        st.toast("Iniciando análisis con YOLO...")
-
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            tiempo_actual_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
-            tiempo_s = tiempo_actual_ms / 1000.0
-            
-            if tiempo_s > fin:
-                break
-
-            centro_raton = (0, 0)
-            nose_pt = (0, 0)
-            tail_pt = (0, 0)
-
-            # --- A. DETECCIÓN (YOLO O SIMULACIÓN) ---
-            if usar_modelo_real and model:
-                results = model(frame, conf=confianza, verbose=False)
-                res = results[0]
-                
-                # Dibujar detecciones
-                frame = res.plot()
-
-                if len(res.boxes) > 0:
-                    # Centro por defecto (bounding box)
-                    box = res.boxes[0].xywh.cpu().numpy()[0]
-                    centro_raton = (int(box[0]), int(box[1]))
-                    
-                    # Si es modelo Pose, extraemos puntos clave
-                    if hasattr(res, "keypoints") and res.keypoints is not None:
-                        try:
-                            pts = res.keypoints.xy.cpu().numpy()[0] # [N, 2]
-                            if len(pts) > 0:
-                                # YOLOv8-Pose suele tener: 0: Nariz, 1-2: Ojos, 3-4: Orejas... 
-                                # Pero esto depende del entrenamiento. Asumiremos 0 como nariz.
-                                nose_pt = (int(pts[0][0]), int(pts[0][1]))
-                                # Usamos la nariz como centro principal si está disponible
-                                if nose_pt != (0, 0):
-                                    centro_raton = nose_pt
-                                
-                                # Intentamos agarrar la cola (último punto usualmente en modelos de ratones custom)
-                                if len(pts) > 16: # Asumiendo modelo completo
-                                    tail_pt = (int(pts[16][0]), int(pts[16][1]))
-                        except:
-                            pass
-            else:
-                # Simulación de ratón moviéndose en círculo
-                h, w, _ = frame.shape
-                import math
-                t = time.time()
-                cx = int(w / 2 + 150 * math.cos(t * 1.5))
-                cy = int(h / 2 + 100 * math.sin(t * 1.5))
-                centro_raton = (cx, cy)
-                cv2.circle(frame, centro_raton, 10, (0, 0, 255), -1)
-
-            # --- B. LÓGICA DE ZONAS ---
-            zona_actual = checar_zona(centro_raton, zonas)
-            
-            # Guardamos en la lista para el DataFrame final
-            resultados_data.append({
-                "Tiempo (s)": tiempo_s,
-                "Zona": zona_actual,
-                "x": centro_raton[0],
-                "y": centro_raton[1]
-            })
-
-            # --- C. DIBUJAR ZONAS SOBRE EL VIDEO ---
-            overlay = frame.copy()
-            for z in zonas:
-                color = (0, 255, 0) if z["Nombre Zona"] == zona_actual else (255, 0, 0)
-                p1 = (int(z["left"]), int(z["top"]))
-                p2 = (int(z["left"] + z["width"]), int(z["top"] + z["height"]))
-                cv2.rectangle(overlay, p1, p2, color, 2)
-                cv2.putText(overlay, z["Nombre Zona"], (p1[0], p1[1] - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-
-            frame = cv2.addWeighted(overlay, 0.6, frame, 0.4, 0)
-
-            # --- D. ACTUALIZAR INTERFAZ ---
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            image_placeholder.image(frame_rgb, channels="RGB", use_container_width=True)
-            metric_placeholder.metric("Zona actual", zona_actual)
-
-            progreso = (tiempo_s - inicio) / tiempo_limite
-            barra_progreso.progress(min(max(progreso, 0.0), 1.0))
-
-        cap.release()
+        st.toast("Iniciando análisis por sustracción de fondo..." if motor_clasico else "Iniciando análisis con YOLO...")
+
+        alto_dec = int(round(meta_video["alto"] / escala))
+        ancho_dec = int(round(meta_video["ancho"] / escala))
+        tam_lote = tam_lote_usuario or tam_lote_auto(alto_dec, ancho_dec)
+        st.caption(f"📦 Inferencia por lotes de {tam_lote} frames.")
+
+        # Caja de la arena en coordenadas del video decodificado (se calcula una vez)
+        recorte = None
+        if recortar_arena:
+            x0, y0, x1, y1 = caja_arena(zonas, meta_video["ancho"], meta_video["alto"])
+            recorte = (
+                int(x0 / escala), int(y0 / escala),
+                min(int(np.ceil(x1 / escala)), ancho_dec), min(int(np.ceil(y1 / escala)), alto_dec),
+            )
+            fraccion = (recorte[2] - recorte[0]) * (recorte[3] - recorte[1]) / (ancho_dec * alto_dec)
+            st.caption(f"✂️ Inferencia sobre la arena: {fraccion:.0%} de los píxeles del frame.")
+
+        if motor_clasico:
+            fondo_bgr, _ = fondo_mediana(ruta_video, inicio, fin)
+            detectar = DetectorFondo(
+                fondo_bgr, (ancho_dec, alto_dec), mapa_zonas, recorte,
+                umbral=umbral_fondo, estimar_pose=estimar_pose,
+            )
+        elif usar_modelo_real and model:
+            detectar = lambda frames: detectar_yolo(model, frames, confianza)
+        else:
+            detectar = detectar_simulado
+
+        # Decodificación, inferencia por lotes y asignación de zonas (vectorizada por lote)
+        # en hilos; aquí solo anotación e interfaz
+        previa = VistaPrevia(image_placeholder, hz_previa if vista_previa else 0)
+        ritmo_interfaz = VistaPrevia(None, hz_previa if vista_previa else 1.0)
+        if not vista_previa:
+            image_placeholder.info("🕶️ Modo headless: sin vista previa durante el análisis.")
+        exportador = None
+        if exportar_video:
+            exportador = ExportadorVideo(
+                ruta_exportacion(ruta_video, inicio, fin), fps or 30.0,
+                alto=alto_exportacion, paso=int(paso_exportacion),
+            )
+
+        with (
+            exportador or contextlib.nullcontext(),
+            PipelineVideo(cap, indice_frames.pts, n_frame, fin, detectar, tam_lote,
+                          mapa_zonas=mapa_zonas, escala=escala, recorte=recorte,
+                          lado_modelo=TAM_ENTRADA_MODELO if reducir_entrada else None,
+                          refresco_k=refresco_k if omitir_estaticos else 0,
+                          intervalo_deteccion=intervalo_deteccion if modo_hibrido else 1) as pipeline,
+        ):
+            for n_frame, tiempo_s, frame, deteccion in pipeline:
+                zona_actual = deteccion["zona"]
+
+                # --- A. RESULTADOS (zona y coordenadas en resolución original) ---
+                resultados_data.append({
+                    "Tiempo (s)": tiempo_s,
+                    "Zona": zona_actual,
+                    "x": deteccion["x"],
+                    "y": deteccion["y"],
+                    "Reutilizado": deteccion["reutilizado"],
+                    "Seguido": deteccion["seguido"],
+                })
+
+                # Interfaz limitada en frecuencia: el análisis nunca espera al navegador
+                if ritmo_interfaz.toca():
+                    metric_placeholder.metric("Zona actual", zona_actual)
+                    progreso = (tiempo_s - inicio) / tiempo_limite
+                    barra_progreso.progress(min(max(progreso, 0.0), 1.0))
+                exportar_frame = exportador is not None and exportador.toca()
+                mostrar_frame = previa.toca()
+                if not (exportar_frame or mostrar_frame):
+                    continue
+
+                # --- B. ANOTACIÓN DE LA DETECCIÓN (solo frames que se muestran o exportan) ---
+                if deteccion["resultado"] is not None:
+                    frame = anotar_deteccion(frame, deteccion)
+                elif deteccion["reutilizado"]:
+                    # Posición heredada del último frame inferido (escena sin movimiento)
+                    cv2.circle(frame, deteccion["centro"], 10, (200, 200, 200), 2)
+                elif deteccion["seguido"]:
+                    # Posición propagada por flujo óptico entre detecciones
+                    cv2.circle(frame, deteccion["centro"], 10, (255, 200, 0), 2)
+                elif motor_clasico:
+                    if deteccion["centro"] != (0, 0):
+                        cv2.circle(frame, deteccion["centro"], 8, (0, 0, 255), -1)
+                    if deteccion["nariz"] != (0, 0):
+                        cv2.line(frame, deteccion["cola"], deteccion["nariz"], (0, 255, 255), 2)
+                        cv2.circle(frame, deteccion["nariz"], 4, (0, 255, 255), -1)
+                elif not usar_modelo_real or not model:
+                    cv2.circle(frame, deteccion["centro"], 10, (0, 0, 255), -1)
+
+                # --- C. DIBUJAR ZONAS SOBRE EL VIDEO (capa precalculada) ---
+                frame = capa_zonas.componer(frame, zona_actual)
+
+                # --- D. EXPORTACIÓN (hilo aparte) Y VISTA PREVIA (reducida y en JPEG) ---
+                if exportar_frame:
+                    exportador.enviar(frame)
+                if mostrar_frame:
+                    previa.mostrar(frame)
+
+        metric_placeholder.metric("Zona actual", zona_actual if resultados_data else "—")
+        barra_progreso.progress(1.0)
+        if resultados_data:
+            st.caption(
+                f"🧮 Llamadas al detector: {pipeline.inferencias} de {len(resultados_data)} frames "
+                f"({pipeline.inferencias / len(resultados_data):.0%}); "
+                f"{pipeline.seguidos} frames por seguimiento."
+            )
+        if exportador is not None:
+            if exportador.error:
+                st.error(f"No se pudo exportar el video anotado: {exportador.error}")
+            elif exportador.escritos:
+                st.caption(
+                    f"🎞️ Video anotado: {exportador.escritos} frames escritos, "
+                    f"{exportador.repetidos} repetidos porque el codificador iba atrasado."
+                )
+                if exportador.repetidos > 0.1 * exportador.escritos:
+                    st.warning("Muchos frames repetidos: baja la resolución o exporta 1 de cada N frames.")
+                st.video(exportador.ruta)
         st.success("✅ Análisis completado.")
 
     # ================== 9. PERSISTENCIA DE RESULTADOS ==================
     df_final = pd.DataFrame(resultados_data)
+    # Coordenadas normalizadas (lente + homografía al laberinto) sobre la trayectoria ya calculada
+    calibracion = cargar_calibracion(rig_calibracion) if rig_calibracion in listar_calibraciones() else None
+    normalizadas = normalizar_trayectoria(df_final["x"], df_final["y"], zonas, calibracion) if len(df_final) else None
+    if normalizadas is not None:
+        df_final["x_norm"], df_final["y_norm"] = normalizadas
     st.session_state["resultados_analisis"] = df_final
     
     st.markdown('<div class="tt-card">', unsafe_allow_html=True)
@@ -295,16 +295,27 @@ c1, c2 = st.columns([3, 1])
 
 with c1:
     st.markdown('<div class="tt-card">', unsafe_allow_html=True)
+    # Coordenadas canónicas (cm) permiten comparar videos de distintas cámaras
+    col_x, col_y = "x", "y"
+    if "x_norm" in df.columns and df["x_norm"].notna().any():
+        espacio = st.radio(
+            "Coordenadas", ["Píxeles del video", "Laberinto normalizado (cm)"], index=1, horizontal=True
+        )
+        if espacio.startswith("Laberinto"):
+            col_x, col_y = "x_norm", "y_norm"
     fig_map = px.density_heatmap(
         df,
-        x="x",
-        y="y",
+        x=col_x,
+        y=col_y,
         nbinsx=30,
         nbinsy=30,
         color_continuous_scale="Viridis",
         title="Zonas de mayor permanencia",
     )
-    fig_map.update_yaxes(autorange="reversed")
+    if col_x == "x":
+        fig_map.update_yaxes(autorange="reversed")
+    else:
+        fig_map.update_yaxes(scaleanchor="x", scaleratio=1)
     fig_map.update_layout(
         plot_bgcolor="rgba(0,0,0,0)",
         paper_bgcolor="rgba(0,0,0,0)",
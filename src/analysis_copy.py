@@ -0,0 +1,120 @@
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.frame_index import obtener_indice_frames
+from src.video_meta import obtener_metadatos
+from src.video_store import CARPETA_VIDEOS
+
+# Copia intermedia para análisis: solo el rango elegido, a la resolución que usan
+# los modelos y con GOP muy corto (sin B-frames) para que saltar/partir sea barato.
+CARPETA_ANALISIS = os.path.join(CARPETA_VIDEOS, "analysis")
+GOP_ANALISIS = 10
+SUFIJO_INFO = ".json"
+
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="copia-analisis")
+_en_curso = {}
+_lock = threading.Lock()
+
+
+def _ffmpeg_exe() -> str:
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def ruta_copia(ruta_video: str, t_inicio: float, t_fin: float, alto: int) -> str:
+    """Nombre en caché por (hash de contenido, rango, resolución)."""
+    base = os.path.splitext(os.path.basename(ruta_video))[0]
+    return os.path.join(
+        CARPETA_ANALISIS,
+        f"{base}_{int(t_inicio * 1000)}_{int(t_fin * 1000)}ms_{alto}p.mp4",
+    )
+
+
+def crear_copia_analisis(ruta_video: str, t_inicio: float, t_fin: float, alto: int) -> dict:
+    """Transcodifica el rango a 'alto' px con GOP corto; devuelve la info de la copia."""
+    salida = ruta_copia(ruta_video, t_inicio, t_fin, alto)
+    if os.path.exists(salida + SUFIJO_INFO):
+        with open(salida + SUFIJO_INFO, "r", encoding="utf-8") as f:
+            return json.load(f)
+    os.makedirs(CARPETA_ANALISIS, exist_ok=True)
+
+    meta = obtener_metadatos(ruta_video)
+    indice = obtener_indice_frames(ruta_video)
+    n_inicio = indice.frame_en_tiempo(t_inicio)
+    n_fin = indice.frame_en_tiempo(t_fin)
+    alto = min(alto, meta["alto"]) if meta["alto"] else alto
+
+    ruta_tmp = salida + ".part.mp4"
+    cmd = [
+        _ffmpeg_exe(), "-loglevel", "error", "-y",
+        # -ss antes de -i con recodificación es exacto: el primer frame es n_inicio
+        "-ss", f"{indice.pts[n_inicio]:.6f}",
+        "-i", ruta_video,
+        "-frames:v", str(n_fin - n_inicio + 1),
+        "-map", "0:v:0", "-an",
+        "-vf", f"scale=-2:{alto}",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "18",
+        "-g", str(GOP_ANALISIS), "-keyint_min", str(GOP_ANALISIS),
+        "-sc_threshold", "0", "-bf", "0",
+        "-fps_mode", "passthrough", "-pix_fmt", "yuv420p",
+        ruta_tmp,
+    ]
+    res = subprocess.run(cmd, capture_output=True, text=True)
+    if res.returncode != 0:
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+        raise RuntimeError(res.stderr.strip()[-500:])
+    os.replace(ruta_tmp, salida)
+
+    ancho_copia = obtener_metadatos(salida)["ancho"]
+    info = {
+        "ruta": salida,
+        "fuente": ruta_video,
+        "inicio_solicitado": t_inicio,
+        "fin_solicitado": t_fin,
+        "alto": alto,
+        "frame_base": int(n_inicio),
+        "offset_frames": 0,
+        "frames": int(n_fin - n_inicio + 1),
+        # Factor para llevar coordenadas de la copia a la resolución original
+        "escala": meta["ancho"] / ancho_copia if ancho_copia else 1.0,
+    }
+    with open(salida + SUFIJO_INFO, "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=4)
+    return info
+
+
+def _trabajo_copia(ruta_video, t_inicio, t_fin, alto):
+    try:
+        crear_copia_analisis(ruta_video, t_inicio, t_fin, alto)
+    except Exception as e:
+        print(f"[COPIA] Error creando copia de análisis de {ruta_video}: {e}")
+
+
+def programar_copia_analisis(ruta_video: str, t_inicio: float, t_fin: float, alto: int):
+    """Encola la creación de la copia en segundo plano (idempotente)."""
+    clave = ruta_copia(ruta_video, t_inicio, t_fin, alto)
+    if os.path.exists(clave + SUFIJO_INFO):
+        return
+    with _lock:
+        futuro = _en_curso.get(clave)
+        if futuro is None or futuro.done():
+            _en_curso[clave] = _pool.submit(_trabajo_copia, ruta_video, t_inicio, t_fin, alto)
+
+
+def buscar_copia_analisis(ruta_video: str, t_inicio: float, t_fin: float):
+    """Info de una copia ya terminada para ese rango (la de mayor resolución), o None."""
+    if not os.path.isdir(CARPETA_ANALISIS):
+        return None
+    prefijo = os.path.basename(ruta_copia(ruta_video, t_inicio, t_fin, 0)).rsplit("_", 1)[0] + "_"
+    mejor = None
+    for nombre in os.listdir(CARPETA_ANALISIS):
+        if nombre.startswith(prefijo) and nombre.endswith(".mp4" + SUFIJO_INFO):
+            with open(os.path.join(CARPETA_ANALISIS, nombre), "r", encoding="utf-8") as f:
+                info = json.load(f)
+            if os.path.exists(info["ruta"]) and (mejor is None or info["alto"] > mejor["alto"]):
+                mejor = info
+    return mejor
@@ -0,0 +1,112 @@
+import hashlib
+import os
+
+import cv2
+import numpy as np
+
+from src.frame_index import iterar_frames, obtener_indice_frames
+from src.video_meta import clave_video, obtener_metadatos
+from src.video_store import CARPETA_VIDEOS
+
+# Fondo "sin ratón": mediana de K frames muestreados a lo largo del rango de análisis
+CARPETA_FONDOS = os.path.join(CARPETA_VIDEOS, "cache", "fondos")
+K_MUESTRAS = 25
+ANCHO_MAX_FONDO = 960
+# Corrección de "fantasmas": un ratón quieto en más de la mitad de las muestras queda en la mediana
+UMBRAL_FANTASMA = 25  # niveles de gris de diferencia con la mediana
+AREA_MIN_FANTASMA = 0.0002  # fracción de la imagen que debe ocupar un blob para contar
+MIN_VOTOS_FANTASMA = 2  # muestras que deben señalar el mismo píxel como fantasma
+
+
+def frames_de_muestra(indice, n_inicio: int, n_fin: int, k: int) -> np.ndarray:
+    """
+    K frames repartidos uniformemente en [n_inicio, n_fin]. Si hay keyframes suficientes
+    en el rango se toma el keyframe más cercano a cada muestra (solo se decodifican keyframes).
+    """
+    objetivo = np.linspace(n_inicio, n_fin, k).round().astype(np.int64)
+    kf = indice.keyframes[(indice.keyframes >= n_inicio) & (indice.keyframes <= n_fin)]
+    if indice.exacto and len(kf) >= k:
+        pos = np.clip(np.searchsorted(kf, objetivo), 1, len(kf) - 1)
+        izquierda, derecha = kf[pos - 1], kf[pos]
+        objetivo = np.where(objetivo - izquierda <= derecha - objetivo, izquierda, derecha)
+    return np.unique(objetivo)
+
+
+def _quitar_fantasmas(muestras: np.ndarray, fondo: np.ndarray) -> np.ndarray:
+    """
+    Si el ratón pasó quieto la mayoría del rango, la mediana lo conserva. Se reconoce porque
+    en las muestras donde ya se fue aparecen DOS blobs contra la mediana: el ratón real y el
+    hueco que dejó, siempre en el mismo lugar. En cada muestra con varios blobs, el que más
+    se repite entre muestras es el fantasma; sus píxeles toman la mediana de las muestras que
+    los señalan (las que muestran el piso).
+    """
+    gris_fondo = cv2.GaussianBlur(cv2.cvtColor(fondo, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+    nucleo = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+    area_min = AREA_MIN_FANTASMA * fondo.shape[0] * fondo.shape[1]
+    mascaras = np.zeros(muestras.shape[:3], dtype=bool)
+    for i, muestra in enumerate(muestras):
+        gris = cv2.GaussianBlur(cv2.cvtColor(muestra, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        binaria = (cv2.absdiff(gris, gris_fondo) > UMBRAL_FANTASMA).astype(np.uint8)
+        mascaras[i] = cv2.morphologyEx(binaria, cv2.MORPH_OPEN, nucleo) > 0
+    repeticiones = mascaras.sum(axis=0)
+
+    votos = np.zeros(fondo.shape[:2], dtype=np.int32)
+    for mascara in mascaras:
+        n, etiquetas, stats, _ = cv2.connectedComponentsWithStats(mascara.astype(np.uint8))
+        grandes = [k for k in range(1, n) if stats[k, cv2.CC_STAT_AREA] >= area_min]
+        if len(grandes) < 2:
+            continue
+        fantasma = max(grandes, key=lambda k: repeticiones[etiquetas == k].mean())
+        votos[etiquetas == fantasma] += 1
+
+    region = votos >= MIN_VOTOS_FANTASMA
+    if not region.any():
+        return fondo
+    region = cv2.dilate(region.astype(np.uint8), nucleo) > 0
+    corregido = fondo.copy()
+    ys, xs = np.nonzero(region)
+    senaladas = mascaras[:, ys, xs]
+    # Por píxel: mediana de las muestras que lo señalan (piso); si ninguna, se deja la mediana
+    con_piso = senaladas.any(axis=0)
+    ys, xs, senaladas = ys[con_piso], xs[con_piso], senaladas[:, con_piso]
+    valores = muestras[:, ys, xs].astype(np.float32)
+    valores[~senaladas] = np.nan
+    corregido[ys, xs] = np.nanmedian(valores, axis=0).astype(np.uint8)
+    return corregido
+
+
+def fondo_mediana(ruta_video: str, t_inicio: float, t_fin: float,
+                  k: int = K_MUESTRAS, ancho_max: int = ANCHO_MAX_FONDO, meta: dict = None):
+    """
+    Imagen BGR de fondo (mediana por píxel de K muestras), reducida a 'ancho_max'.
+    Memoria acotada a K frames reducidos. Devuelve (fondo, escala) donde escala
+    lleva coordenadas del fondo a la resolución original. Se cachea en disco.
+    'meta' (opcional) son los metadatos ya probados: así no se escribe el índice compartido.
+    """
+    base = hashlib.sha1(clave_video(ruta_video).encode("utf-8")).hexdigest()[:16]
+    ruta_png = os.path.join(
+        CARPETA_FONDOS,
+        f"{base}_mediana_{int(t_inicio * 1000)}_{int(t_fin * 1000)}_{k}_{ancho_max}.png",
+    )
+    indice = obtener_indice_frames(ruta_video, meta)
+
+    if os.path.exists(ruta_png):
+        fondo = cv2.imread(ruta_png)
+    else:
+        n_inicio = indice.frame_en_tiempo(t_inicio)
+        n_fin = indice.frame_en_tiempo(t_fin)
+        muestras = []
+        for _, frame in iterar_frames(ruta_video, frames_de_muestra(indice, n_inicio, n_fin, k), indice):
+            h, w = frame.shape[:2]
+            if w > ancho_max:
+                frame = cv2.resize(frame, (ancho_max, int(h * ancho_max / w)), interpolation=cv2.INTER_AREA)
+            muestras.append(frame)
+        if not muestras:
+            raise ValueError("No se pudo decodificar ningún frame para el fondo.")
+        muestras = np.stack(muestras)
+        fondo = _quitar_fantasmas(muestras, np.median(muestras, axis=0).astype(np.uint8))
+        os.makedirs(CARPETA_FONDOS, exist_ok=True)
+        cv2.imwrite(ruta_png, fondo)
+
+    escala = (meta or obtener_metadatos(ruta_video))["ancho"] / fondo.shape[1]
+    return fondo, escala
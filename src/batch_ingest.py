@@ -0,0 +1,141 @@
+import datetime
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from src.background import fondo_mediana
+from src.frame_index import obtener_indice_frames
+from src.maze_detection import detectar_brazos
+from src.video_meta import guardar_metadatos, probar_video
+from src.video_proxy import generar_proxy, generar_tira
+from src.video_store import CARPETA_VIDEOS, almacenar_archivo, registrar_experimento
+
+# Ingesta por lote a partir de un manifiesto CSV
+CARPETA_LOTES = os.path.join(CARPETA_VIDEOS, "lotes")
+COLUMNAS_REQUERIDAS = ["ruta", "id_raton", "tratamiento", "fecha", "inicio", "fin"]
+# Encabezados alternativos aceptados en el manifiesto
+ALIAS_COLUMNAS = {
+    "path": "ruta",
+    "mouse_id": "id_raton",
+    "treatment": "tratamiento",
+    "date": "fecha",
+    "start": "inicio",
+    "end": "fin",
+    "responsible": "responsable",
+}
+TOLERANCIA_RANGO = 0.5  # segundos de holgura al validar 'fin' contra la duración
+
+
+def leer_manifiesto(archivo) -> list:
+    """Lee el CSV del lote y devuelve una lista de entradas normalizadas."""
+    df = pd.read_csv(archivo)
+    df.columns = [ALIAS_COLUMNAS.get(c.strip().lower(), c.strip().lower()) for c in df.columns]
+    faltantes = [c for c in COLUMNAS_REQUERIDAS if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en el manifiesto: {', '.join(faltantes)}")
+    if "responsable" not in df.columns:
+        df["responsable"] = "Equipo TT"
+    df = df.drop_duplicates(subset=["ruta"])
+    return df.astype(object).where(pd.notna(df), None).to_dict("records")
+
+
+def _procesar_entrada(entrada: dict) -> dict:
+    """
+    Trabajo de un proceso del pool: hash + almacén, metadatos, índice de frames,
+    previsualizaciones y validación del rango. No escribe los índices compartidos:
+    'meta' se prueba aquí y se pasa a todo lo que lo necesita; el proceso principal
+    lo registra con guardar_metadatos.
+    """
+    ruta = entrada["ruta"]
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"No existe el archivo: {ruta}")
+
+    sha256, ruta_final, duplicado = almacenar_archivo(ruta)
+    meta = probar_video(ruta_final)
+
+    inicio = float(entrada["inicio"] or 0.0)
+    fin = float(entrada["fin"]) if entrada["fin"] is not None else meta["duracion"]
+    if not (0.0 <= inicio < fin <= meta["duracion"] + TOLERANCIA_RANGO):
+        raise ValueError(f"Rango inválido {inicio}-{fin} s (duración {meta['duracion']:.1f} s)")
+    fin = min(fin, meta["duracion"])
+
+    obtener_indice_frames(ruta_final, meta)
+    generar_tira(ruta_final, meta)
+    generar_proxy(ruta_final)
+
+    # Zonas propuestas sobre el fondo mediana: el lote puede analizarse sin dibujar
+    try:
+        zonas = detectar_brazos(*fondo_mediana(ruta_final, inicio, fin, meta=meta))
+    except Exception as e:
+        print(f"[LOTE] Sin detección automática de zonas para {ruta}: {e}")
+        zonas = None
+
+    return {
+        "sha256": sha256,
+        "ruta": ruta_final,
+        "duplicado": duplicado,
+        "meta": meta,
+        "inicio": inicio,
+        "fin": fin,
+        "zonas": zonas,
+    }
+
+
+def procesar_manifiesto(entradas: list, max_workers: int = None):
+    """
+    Procesa todas las entradas en un pool de procesos. Genera (i, resultado) en el
+    orden en que terminan; resultado trae 'Estado' y, si fue bien, los datos de sesión
+    (ruta_video_actual, inicio_recorte, fin_recorte) listos para el análisis.
+    """
+    max_workers = max_workers or max(1, min(len(entradas), (os.cpu_count() or 2) // 2))
+    lote = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futuros = {pool.submit(_procesar_entrada, e): i for i, e in enumerate(entradas)}
+        for futuro in as_completed(futuros):
+            i = futuros[futuro]
+            entrada = entradas[i]
+            try:
+                res = futuro.result()
+            except Exception as e:
+                yield i, {"Estado": f"Error: {e}"}
+                continue
+
+            # Los índices compartidos se escriben solo desde el proceso principal
+            guardar_metadatos(res["ruta"], res["meta"])
+            experimento = {
+                "ruta_video_actual": res["ruta"],
+                "inicio_recorte": res["inicio"],
+                "fin_recorte": res["fin"],
+                "zonas_configuradas": res["zonas"],
+            }
+            registrar_experimento(
+                res["sha256"], res["ruta"], entrada["id_raton"], entrada["tratamiento"],
+                entrada["fecha"], entrada["responsable"], os.path.basename(entrada["ruta"]),
+                origen=os.path.abspath(entrada["ruta"]), **experimento,
+            )
+            lote.append({
+                "id_raton": entrada["id_raton"],
+                "tratamiento": entrada["tratamiento"],
+                "fecha": str(entrada["fecha"]),
+                "responsable": entrada["responsable"],
+                **experimento,
+            })
+            yield i, {
+                "Estado": "Duplicado" if res["duplicado"] else "Listo",
+                "Duración (s)": round(res["meta"]["duracion"], 1),
+                **experimento,
+            }
+
+    guardar_lote(lote)
+
+
+def guardar_lote(experimentos: list) -> str:
+    """Guarda el lote para poder analizarlo después de forma desatendida."""
+    os.makedirs(CARPETA_LOTES, exist_ok=True)
+    nombre = datetime.datetime.now().strftime("lote_%Y%m%d_%H%M%S.json")
+    ruta = os.path.join(CARPETA_LOTES, nombre)
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(experimentos, f, indent=4, ensure_ascii=False)
+    return ruta
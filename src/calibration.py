@@ -0,0 +1,146 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+from src.video_store import CARPETA_VIDEOS
+from src.zonas import poligono_de_zona
+
+# Calibración por equipo de grabación: lente (matriz de cámara + distorsión)
+# y homografía a un sistema de coordenadas canónico del laberinto.
+CARPETA_CALIBRACIONES = os.path.join(CARPETA_VIDEOS, "calibraciones")
+# Coordenadas canónicas en cm: centro en (0, 0), brazos abiertos sobre el eje x
+# y cerrados sobre el eje y; la punta de cada brazo queda a LARGO_BRAZO_CM.
+LARGO_BRAZO_CM = 35.0
+
+
+def guardar_calibracion(nombre: str, matriz_camara, distorsion, homografia=None) -> str:
+    """Guarda la calibración de un equipo. 'homografia' (opcional) va de píxeles sin distorsión a cm."""
+    os.makedirs(CARPETA_CALIBRACIONES, exist_ok=True)
+    ruta = os.path.join(CARPETA_CALIBRACIONES, f"{nombre}.json")
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump({
+            "nombre": nombre,
+            "matriz_camara": np.asarray(matriz_camara, dtype=float).tolist(),
+            "distorsion": np.asarray(distorsion, dtype=float).ravel().tolist(),
+            "homografia": None if homografia is None else np.asarray(homografia, dtype=float).tolist(),
+        }, f, indent=4, ensure_ascii=False)
+    return ruta
+
+
+def listar_calibraciones() -> list:
+    if not os.path.isdir(CARPETA_CALIBRACIONES):
+        return []
+    return sorted(os.path.splitext(a)[0] for a in os.listdir(CARPETA_CALIBRACIONES) if a.endswith(".json"))
+
+
+def cargar_calibracion(nombre: str) -> dict:
+    with open(os.path.join(CARPETA_CALIBRACIONES, f"{nombre}.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def corregir_lente(xs, ys, calibracion: dict = None):
+    """Quita la distorsión de lente a arreglos de puntos (sin tocar los frames)."""
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    if not calibracion:
+        return xs, ys
+    K = np.asarray(calibracion["matriz_camara"], dtype=np.float64)
+    D = np.asarray(calibracion["distorsion"], dtype=np.float64)
+    validos = np.isfinite(xs) & np.isfinite(ys)
+    salida_x, salida_y = np.full(xs.shape, np.nan), np.full(ys.shape, np.nan)
+    if validos.any():
+        pts = np.stack([xs[validos], ys[validos]], axis=1).reshape(-1, 1, 2)
+        # P=K devuelve píxeles (no coordenadas normalizadas de cámara)
+        corregidos = cv2.undistortPoints(pts, K, D, P=K).reshape(-1, 2)
+        salida_x[validos], salida_y[validos] = corregidos[:, 0], corregidos[:, 1]
+    return salida_x, salida_y
+
+
+def homografia_desde_zonas(zonas: list, calibracion: dict = None):
+    """
+    Homografía píxeles (sin distorsión) -> cm canónicos a partir de las zonas del laberinto:
+    punta de cada brazo y centro de 'Centro'. None si faltan brazos o el centro.
+    """
+    poligonos = {z["Nombre Zona"]: poligono_de_zona(z) for z in zonas}
+    centro = next((p.mean(axis=0) for n, p in poligonos.items() if n.startswith("Centro")), None)
+    abiertos = [p for n, p in sorted(poligonos.items()) if n.startswith("Brazo Abierto")]
+    cerrados = [p for n, p in sorted(poligonos.items()) if n.startswith("Brazo Cerrado")]
+    if centro is None or len(abiertos) != 2 or len(cerrados) != 2:
+        return None
+
+    def punta(poligono):
+        # Punto medio de los dos vértices más lejanos al centro
+        lejanos = np.argsort(np.linalg.norm(poligono - centro, axis=1))[-2:]
+        return poligono[lejanos].mean(axis=0)
+
+    puntas_abiertos = [punta(p) for p in abiertos]
+    puntas_cerrados = [punta(p) for p in cerrados]
+    # El cerrado a la "izquierda" del primer abierto va a +y (sistema consistente entre videos)
+    eje_x = puntas_abiertos[0] - centro
+    if np.cross(eje_x, puntas_cerrados[0] - centro) < 0:
+        puntas_cerrados.reverse()
+
+    L = LARGO_BRAZO_CM
+    origen = np.array([centro, *puntas_abiertos, *puntas_cerrados])
+    destino = np.array([[0, 0], [L, 0], [-L, 0], [0, L], [0, -L]], dtype=np.float64)
+    ox, oy = corregir_lente(origen[:, 0], origen[:, 1], calibracion)
+    H, _ = cv2.findHomography(np.stack([ox, oy], axis=1), destino, 0)
+    return H
+
+
+def normalizar_trayectoria(xs, ys, zonas: list, calibracion: dict = None):
+    """
+    Coordenadas canónicas (cm) de una trayectoria completa, vectorizado:
+    corrección de lente + homografía. Devuelve (x_norm, y_norm) o None si no hay homografía.
+    """
+    H = calibracion.get("homografia") if calibracion else None
+    H = np.asarray(H, dtype=np.float64) if H is not None else homografia_desde_zonas(zonas, calibracion)
+    if H is None:
+        return None
+    ux, uy = corregir_lente(xs, ys, calibracion)
+    # perspectiveTransform vectorizado a mano (propaga NaN sin excepciones)
+    w = H[2, 0] * ux + H[2, 1] * uy + H[2, 2]
+    x_norm = (H[0, 0] * ux + H[0, 1] * uy + H[0, 2]) / w
+    y_norm = (H[1, 0] * ux + H[1, 1] * uy + H[1, 2]) / w
+    return x_norm, y_norm
+
+
+def calibrar_lente(imagenes: list, tablero=(9, 6), tam_cuadro: float = 1.0):
+    """Matriz de cámara y distorsión a partir de fotos de un tablero de ajedrez (cv2.calibrateCamera)."""
+    objp = np.zeros((tablero[0] * tablero[1], 3), np.float32)
+    objp[:, :2] = np.mgrid[0:tablero[0], 0:tablero[1]].T.reshape(-1, 2) * tam_cuadro
+    puntos_obj, puntos_img, tam = [], [], None
+    for ruta in imagenes:
+        gris = cv2.imread(ruta, cv2.IMREAD_GRAYSCALE)
+        if gris is None:
+            continue
+        tam = gris.shape[::-1]
+        ok, esquinas = cv2.findChessboardCorners(gris, tablero)
+        if ok:
+            esquinas = cv2.cornerSubPix(
+                gris, esquinas, (11, 11), (-1, -1),
+                (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 1e-3),
+            )
+            puntos_obj.append(objp)
+            puntos_img.append(esquinas)
+    if len(puntos_obj) < 3:
+        raise ValueError("Se necesitan al menos 3 imágenes con el tablero detectado.")
+    error, K, D, _, _ = cv2.calibrateCamera(puntos_obj, puntos_img, tam, None, None)
+    return K, D, error
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Calibra la lente de un equipo con fotos de un tablero.")
+    parser.add_argument("nombre", help="Nombre del equipo (rig)")
+    parser.add_argument("imagenes", nargs="+", help="Fotos del tablero de ajedrez")
+    parser.add_argument("--tablero", default="9x6", help="Esquinas interiores, p. ej. 9x6")
+    args = parser.parse_args()
+
+    columnas, filas = (int(v) for v in args.tablero.lower().split("x"))
+    K, D, error = calibrar_lente(args.imagenes, (columnas, filas))
+    print(f"Error de reproyección: {error:.3f} px")
+    print(f"Guardado en {guardar_calibracion(args.nombre, K, D)}")
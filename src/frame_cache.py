@@ -0,0 +1,84 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+from PIL import Image
+
+from src.analysis_copy import buscar_copia_analisis
+from src.background import CARPETA_FONDOS, fondo_mediana
+from src.frame_index import leer_frame
+from src.video_meta import clave_video, obtener_metadatos
+
+# Fondo del canvas de zonas: se decodifica una vez por (video, tiempo, ancho)
+# y se sirve desde memoria o disco en cada rerun del canvas.
+ANCHO_CANVAS = 800
+MAX_EN_MEMORIA = 16
+
+_memoria = OrderedDict()
+_lock = threading.Lock()
+
+
+def _clave(ruta_video: str, t: float, ancho: int, modo: str) -> str:
+    base = hashlib.sha1(clave_video(ruta_video).encode("utf-8")).hexdigest()[:16]
+    return f"{base}_{modo}_{int(round(t * 1000))}_{ancho}"
+
+
+def _en_memoria(clave: str, valor=None):
+    """Consulta/actualiza la caché LRU en memoria."""
+    with _lock:
+        if valor is not None:
+            _memoria[clave] = valor
+            _memoria.move_to_end(clave)
+            while len(_memoria) > MAX_EN_MEMORIA:
+                _memoria.popitem(last=False)
+            return valor
+        if clave in _memoria:
+            _memoria.move_to_end(clave)
+            return _memoria[clave]
+    return None
+
+
+def _frame_inicio(ruta_video: str, t: float, t_fin: float = None):
+    """Frame RGB en t; usa la copia de análisis si existe (su frame 0 es justo t)."""
+    copia = buscar_copia_analisis(ruta_video, t, t_fin) if t_fin is not None else None
+    if copia:
+        frame_bgr, _ = leer_frame(copia["ruta"], 0.0)
+    else:
+        frame_bgr, _ = leer_frame(ruta_video, t)
+    return cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+
+
+def fondo_canvas(ruta_video: str, t: float, t_fin: float = None, ancho_canvas: int = ANCHO_CANVAS,
+                 modo: str = "frame"):
+    """
+    Imagen de fondo ya reescalada para el canvas y su factor de escala.
+    modo='frame' usa el fotograma en t; modo='mediana' el fondo sin ratón del rango.
+    Devuelve (PIL.Image, factor_escala, (ancho_real, alto_real)).
+    """
+    meta = obtener_metadatos(ruta_video)
+    ancho_real, alto_real = meta["ancho"], meta["alto"]
+    factor_escala = ancho_real / ancho_canvas
+    alto_canvas = int(alto_real / factor_escala)
+
+    modo_clave = "frame" if modo == "frame" else f"mediana{int(t_fin * 1000)}"
+    clave = _clave(ruta_video, t, ancho_canvas, modo_clave)
+    imagen = _en_memoria(clave)
+    if imagen is None:
+        ruta_png = os.path.join(CARPETA_FONDOS, clave + ".png")
+        if os.path.exists(ruta_png):
+            with Image.open(ruta_png) as img:
+                imagen = img.convert("RGB")
+        else:
+            if modo == "mediana":
+                fondo_bgr, _ = fondo_mediana(ruta_video, t, t_fin)
+                frame_rgb = cv2.cvtColor(fondo_bgr, cv2.COLOR_BGR2RGB)
+            else:
+                frame_rgb = _frame_inicio(ruta_video, t, t_fin)
+            imagen = Image.fromarray(frame_rgb).resize((ancho_canvas, alto_canvas))
+            os.makedirs(CARPETA_FONDOS, exist_ok=True)
+            imagen.save(ruta_png)
+        _en_memoria(clave, imagen)
+
+    return imagen, factor_escala, (ancho_real, alto_real)
@@ -0,0 +1,148 @@
+import os
+
+import cv2
+import numpy as np
+
+from src.mp4_parser import leer_pista_video, tabla_de_frames
+from src.video_meta import obtener_metadatos
+
+# Índice frame -> PTS/keyframe, guardado junto al video como <video>.frames.npz
+SUFIJO_INDICE = ".frames.npz"
+
+_cache_memoria = {}
+
+
+class IndiceFrames:
+    """Tabla por frame (orden de presentación) para buscar por tiempo sin decodificar."""
+
+    def __init__(self, pts, clave, exacto=True):
+        self.exacto = exacto
+        self.pts = np.asarray(pts, dtype=np.float64)
+        self.clave = np.asarray(clave, dtype=bool)
+        self.keyframes = np.flatnonzero(self.clave)
+
+    def __len__(self):
+        return len(self.pts)
+
+    def frame_en_tiempo(self, t: float) -> int:
+        """Primer frame cuyo PTS es >= t (tolerancia de medio microsegundo)."""
+        n = int(np.searchsorted(self.pts, t - 5e-7, side="left"))
+        return min(n, len(self.pts) - 1)
+
+    def keyframe_previo(self, n: int) -> int:
+        """Keyframe más cercano en o antes del frame n."""
+        if len(self.keyframes) == 0:
+            return 0
+        i = int(np.searchsorted(self.keyframes, n, side="right")) - 1
+        return int(self.keyframes[max(i, 0)])
+
+
+def _ruta_indice(ruta_video: str) -> str:
+    return ruta_video + SUFIJO_INDICE
+
+
+def _indice_sintetico(ruta_video: str, meta: dict = None) -> IndiceFrames:
+    """
+    Para contenedores sin tablas de muestras: tiempos a fps constante. Sin keyframes
+    conocidos, cada frame se marca como punto de salto y la búsqueda queda en OpenCV.
+    """
+    meta = meta or obtener_metadatos(ruta_video)
+    fps = meta["fps"] or 30.0
+    n = max(int(meta["frames"]), 1)
+    return IndiceFrames(np.arange(n) / fps, np.ones(n, dtype=bool), exacto=False)
+
+
+def obtener_indice_frames(ruta_video: str, meta: dict = None) -> IndiceFrames:
+    """
+    Carga (o construye una sola vez) el índice de frames del video. 'meta' (opcional)
+    evita consultar el índice de metadatos, p. ej. desde un proceso de la ingesta por lote.
+    """
+    ruta_idx = _ruta_indice(ruta_video)
+    mtime = os.path.getmtime(ruta_video)
+    en_memoria = _cache_memoria.get(ruta_video)
+    if en_memoria and en_memoria[0] == mtime:
+        return en_memoria[1]
+
+    indice = None
+    if os.path.exists(ruta_idx) and os.path.getmtime(ruta_idx) >= mtime:
+        try:
+            with np.load(ruta_idx) as datos:
+                indice = IndiceFrames(datos["pts"], datos["clave"])
+        except Exception as e:
+            print(f"[INDICE] Índice corrupto, se reconstruye: {e}")
+
+    if indice is not None and len(indice) == 0:
+        indice = None  # índice vacío de una versión anterior (MP4 fragmentado)
+
+    if indice is None:
+        try:
+            tabla = tabla_de_frames(leer_pista_video(ruta_video))
+            indice = IndiceFrames(**tabla)
+            np.savez(ruta_idx, **tabla)
+        except Exception as e:
+            print(f"[INDICE] Sin tablas de muestras ({e}); se usan tiempos a fps constante.")
+            indice = _indice_sintetico(ruta_video, meta)
+
+    _cache_memoria[ruta_video] = (mtime, indice)
+    return indice
+
+
+def abrir_en_frame(ruta_video: str, n: int, indice: IndiceFrames = None):
+    """
+    Abre el video y lo deja posicionado para que el siguiente read() devuelva el frame n.
+    Salta directo al keyframe previo y solo decodifica hacia adelante lo necesario.
+    """
+    if indice is None:
+        indice = obtener_indice_frames(ruta_video)
+    cap = cv2.VideoCapture(ruta_video)
+    k = indice.keyframe_previo(n)
+    if k > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, k)
+    for _ in range(n - k):
+        if not cap.grab():
+            break
+    return cap
+
+
+def abrir_en_tiempo(ruta_video: str, t: float, indice: IndiceFrames = None):
+    """Como abrir_en_frame pero por tiempo. Devuelve (cap, n_frame, pts_exacto)."""
+    if indice is None:
+        indice = obtener_indice_frames(ruta_video)
+    n = indice.frame_en_tiempo(t)
+    return abrir_en_frame(ruta_video, n, indice), n, float(indice.pts[n])
+
+
+def leer_frame(ruta_video: str, t: float):
+    """Frame BGR exacto en el tiempo t. Devuelve (frame, pts_exacto)."""
+    cap, _, pts = abrir_en_tiempo(ruta_video, t)
+    ret, frame = cap.read()
+    cap.release()
+    if not ret:
+        raise ValueError(f"No se pudo leer el frame en t={t:.3f}s")
+    return frame, pts
+
+
+def iterar_frames(ruta_video: str, frames, indice: IndiceFrames = None):
+    """
+    Decodifica solo los frames pedidos con un único VideoCapture. Genera (n, frame_bgr)
+    en orden; entre muestras cercanas avanza con grab(), si no salta al keyframe previo.
+    """
+    if indice is None:
+        indice = obtener_indice_frames(ruta_video)
+    cap = cv2.VideoCapture(ruta_video)
+    actual = 0  # frame que devolvería el siguiente read()
+    try:
+        for n in sorted(set(int(f) for f in frames)):
+            k = indice.keyframe_previo(n)
+            if not (k <= actual <= n):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, k)
+                actual = k
+            while actual < n and cap.grab():
+                actual += 1
+            ret, frame = cap.read()
+            if not ret:
+                break
+            actual = n + 1
+            yield n, frame
+    finally:
+        cap.release()
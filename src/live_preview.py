@@ -0,0 +1,44 @@
+import time
+
+import cv2
+
+# Vista previa en vivo: canal aparte, limitado en frecuencia, reducido y en JPEG
+HZ_PREVIA = 3.0
+ANCHO_PREVIA = 640
+CALIDAD_JPEG = 70
+
+
+class VistaPrevia:
+    """
+    Decide cuándo toca refrescar la interfaz (a 'hz' como máximo) y envía el frame
+    reducido y codificado en JPEG. Con hz <= 0 la vista previa queda apagada (headless):
+    el bucle de análisis puede saltarse incluso la anotación de los frames.
+    """
+
+    def __init__(self, placeholder, hz: float = HZ_PREVIA, ancho: int = ANCHO_PREVIA):
+        self.placeholder = placeholder
+        self.periodo = 1.0 / hz if hz > 0 else None
+        self.ancho = ancho
+        self._siguiente = 0.0
+
+    @property
+    def activa(self) -> bool:
+        return self.periodo is not None
+
+    def toca(self) -> bool:
+        """True si ya pasó el periodo desde el último refresco (y lo reserva)."""
+        if not self.activa:
+            return False
+        ahora = time.monotonic()
+        if ahora < self._siguiente:
+            return False
+        self._siguiente = ahora + self.periodo
+        return True
+
+    def mostrar(self, frame_bgr):
+        h, w = frame_bgr.shape[:2]
+        if w > self.ancho:
+            frame_bgr = cv2.resize(frame_bgr, (self.ancho, int(h * self.ancho / w)), interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, CALIDAD_JPEG])
+        if ok:
+            self.placeholder.image(jpeg.tobytes(), use_container_width=True)
@@ -0,0 +1,142 @@
+import math
+
+import cv2
+import numpy as np
+
+from src.zonas import zona_desde_poligono
+
+# Detección automática del laberinto en cruz elevado sobre el fondo mediana
+ANCHO_DETECCION = 480  # resolución de trabajo: la detección es O(píxeles)
+AREA_MIN_RELATIVA = 0.02  # fracción mínima de la imagen que debe ocupar la cruz
+UMBRAL_CONFIANZA = 1.15  # razón de densidad de bordes para distinguir cerrados de abiertos
+
+
+def _mascara_laberinto(gris: np.ndarray) -> np.ndarray:
+    """
+    Componente conexa de la plataforma. Se prueban ambas polaridades de Otsu y se
+    elige la componente grande más cercana al centro con menor solidez (forma de cruz).
+    """
+    h, w = gris.shape
+    suavizada = cv2.GaussianBlur(gris, (5, 5), 0)
+    _, binaria = cv2.threshold(suavizada, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    nucleo = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+    mejor, mejor_puntaje = None, -1.0
+    for candidata in (binaria, cv2.bitwise_not(binaria)):
+        candidata = cv2.morphologyEx(candidata, cv2.MORPH_OPEN, nucleo)
+        n, etiquetas, stats, centroides = cv2.connectedComponentsWithStats(candidata)
+        for i in range(1, n):
+            area = stats[i, cv2.CC_STAT_AREA]
+            if area < AREA_MIN_RELATIVA * h * w:
+                continue
+            x, y, bw, bh = stats[i, :4]
+            if x == 0 and y == 0 and bw == w and bh == h:
+                continue  # es el piso/fondo que rodea todo
+            componente = (etiquetas == i).astype(np.uint8)
+            contornos, _ = cv2.findContours(componente, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            casco = cv2.contourArea(cv2.convexHull(max(contornos, key=cv2.contourArea)))
+            solidez = area / casco if casco else 1.0
+            dist_centro = np.hypot(centroides[i][0] - w / 2, centroides[i][1] - h / 2) / np.hypot(w, h)
+            puntaje = area * (1.0 - solidez) * (1.0 - dist_centro)
+            if puntaje > mejor_puntaje:
+                mejor, mejor_puntaje = componente, puntaje
+
+    if mejor is None:
+        raise ValueError("No se encontró una plataforma con forma de cruz en el fondo.")
+    return cv2.morphologyEx(mejor, cv2.MORPH_CLOSE, nucleo)
+
+
+def _orientacion(mascara: np.ndarray, centro) -> float:
+    """Ángulo (rad, en [0, π/2)) de los brazos: pico del histograma angular módulo 90°."""
+    ys, xs = np.nonzero(mascara)
+    dx, dy = xs - centro[0], ys - centro[1]
+    r = np.hypot(dx, dy)
+    ang = np.mod(np.arctan2(dy, dx), np.pi / 2)
+    hist, bordes = np.histogram(ang, bins=180, range=(0, np.pi / 2), weights=r)
+    # Suavizado circular para que un pico en el borde 0/90° no se parta en dos
+    hist = np.convolve(np.concatenate([hist[-3:], hist, hist[:3]]), np.ones(7) / 7, mode="valid")
+    k = int(np.argmax(hist))
+    return (bordes[k] + bordes[k + 1]) / 2
+
+
+def _rectangulo(centro, eje_u, eje_v, u0, u1, medio_ancho) -> np.ndarray:
+    """Vértices del rectángulo u∈[u0, u1], v∈[-medio_ancho, medio_ancho] en el marco (u, v)."""
+    esquinas = [(u0, -medio_ancho), (u1, -medio_ancho), (u1, medio_ancho), (u0, medio_ancho)]
+    return np.array([centro + u * eje_u + v * eje_v for u, v in esquinas])
+
+
+def detectar_brazos(fondo_bgr: np.ndarray, escala: float = 1.0) -> list:
+    """
+    Propone las zonas del laberinto en cruz a partir del fondo sin ratón.
+    Devuelve zonas (polígonos) en la resolución original del video, con los
+    nombres 'Brazo Abierto N', 'Brazo Cerrado N' y 'Centro 1'.
+    'escala' lleva coordenadas de 'fondo_bgr' a la resolución original.
+    """
+    h, w = fondo_bgr.shape[:2]
+    reduccion = min(1.0, ANCHO_DETECCION / w)
+    if reduccion < 1.0:
+        fondo_bgr = cv2.resize(fondo_bgr, (int(w * reduccion), int(h * reduccion)), interpolation=cv2.INTER_AREA)
+    gris = cv2.cvtColor(fondo_bgr, cv2.COLOR_BGR2GRAY)
+
+    mascara = _mascara_laberinto(gris)
+
+    # Centro: máximo de la transformada de distancia cerca del centroide (el cruce)
+    distancia = cv2.distanceTransform(mascara, cv2.DIST_L2, 5)
+    momentos = cv2.moments(mascara, binaryImage=True)
+    cx, cy = momentos["m10"] / momentos["m00"], momentos["m01"] / momentos["m00"]
+    yy, xx = np.mgrid[:distancia.shape[0], :distancia.shape[1]]
+    cerca = np.hypot(xx - cx, yy - cy) < 0.1 * max(distancia.shape)
+    iy, ix = np.unravel_index(np.argmax(np.where(cerca, distancia, 0)), distancia.shape)
+    centro = np.array([ix, iy], dtype=np.float64)
+
+    alfa = _orientacion(mascara, centro)
+    ejes = [np.array([math.cos(alfa + k * math.pi / 2), math.sin(alfa + k * math.pi / 2)]) for k in range(4)]
+
+    # Coordenadas de todos los píxeles del laberinto en el marco de los brazos
+    ys, xs = np.nonzero(mascara)
+    rel = np.stack([xs, ys], axis=1) - centro
+    u_all = rel @ ejes[0]
+    v_all = rel @ ejes[1]
+
+    # Ancho de brazo: mediana del doble de la distancia al borde a lo largo de los ejes
+    en_eje = np.minimum(np.abs(u_all), np.abs(v_all)) < 1.0
+    medio_ancho = float(np.median(distancia[ys[en_eje], xs[en_eje]]))
+
+    brazos = []
+    bordes = cv2.Canny(cv2.GaussianBlur(gris, (3, 3), 0), 50, 150)
+    for k in range(4):
+        u = rel @ ejes[k]
+        v = rel @ ejes[(k + 1) % 4]
+        en_brazo = (np.abs(v) <= medio_ancho * 1.2) & (u > medio_ancho)
+        largo = float(np.percentile(u[en_brazo], 99)) if en_brazo.any() else medio_ancho * 4
+        poligono = _rectangulo(centro, ejes[k], ejes[(k + 1) % 4], medio_ancho, largo, medio_ancho)
+
+        # Paredes de los brazos cerrados: bordes dentro del brazo (sin el contorno con el piso)
+        franja = np.zeros_like(bordes)
+        cv2.fillPoly(franja, [np.round(_rectangulo(
+            centro, ejes[k], ejes[(k + 1) % 4], medio_ancho * 1.5, largo * 0.95, medio_ancho * 0.85
+        )).astype(np.int32)], 1)
+        densidad = bordes[franja > 0].mean() / 255 if franja.any() else 0.0
+        brazos.append((poligono, densidad))
+
+    # Los brazos opuestos son del mismo tipo: se comparan los dos pares
+    par_a = brazos[0][1] + brazos[2][1]
+    par_b = brazos[1][1] + brazos[3][1]
+    cerrados = (0, 2) if par_a >= par_b else (1, 3)
+    if max(par_a, par_b) < UMBRAL_CONFIANZA * min(par_a, par_b):
+        print("[EPM] Poca diferencia entre pares de brazos; revisa abiertos/cerrados.")
+
+    factor = escala / reduccion
+    zonas = []
+    n_abierto = n_cerrado = 0
+    for k, (poligono, _) in enumerate(brazos):
+        if k in cerrados:
+            n_cerrado += 1
+            nombre = f"Brazo Cerrado {n_cerrado}"
+        else:
+            n_abierto += 1
+            nombre = f"Brazo Abierto {n_abierto}"
+        zonas.append(zona_desde_poligono(nombre, poligono * factor))
+    centro_poligono = _rectangulo(centro, ejes[0], ejes[1], -medio_ancho, medio_ancho, medio_ancho)
+    zonas.append(zona_desde_poligono("Centro 1", centro_poligono * factor))
+    return zonas
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.yolo_pipeline import TAM_ENTRADA_MODELO
+
+# Registro de modelos YOLO compartido por todo el proceso (todas las sesiones de Streamlit):
+# cada modelo se carga y se calienta una vez por (archivo, contenido, dispositivo, entrada)
+# y se conserva en memoria con desalojo LRU bajo un presupuesto.
+PRESUPUESTO_MODELOS_MB = 1024
+LOTE_CALENTAMIENTO = 2
+TAM_BLOQUE_HASH = 8 * 1024 * 1024
+
+_modelos = OrderedDict()  # clave -> ModeloCompartido
+_cargando = {}  # clave -> Lock, para que dos sesiones no carguen el mismo modelo a la vez
+_hashes = {}  # (ruta, mtime, tamaño) -> sha256
+_lock = threading.Lock()
+
+
+def _hash_archivo(ruta: str) -> str:
+    """SHA-256 del archivo de pesos (memorizado por ruta + mtime + tamaño); '' si aún no existe."""
+    if not os.path.isfile(ruta):
+        return ""  # pesos oficiales que ultralytics descarga por nombre
+    estado = os.stat(ruta)
+    firma = (ruta, estado.st_mtime_ns, estado.st_size)
+    if firma not in _hashes:
+        sha = hashlib.sha256()
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(TAM_BLOQUE_HASH), b""):
+                sha.update(bloque)
+        _hashes[firma] = sha.hexdigest()
+    return _hashes[firma]
+
+
+def _tam_modelo(model, ruta: str) -> int:
+    """Bytes que ocupan los parámetros del modelo (o el archivo, si no se pueden contar)."""
+    try:
+        return sum(p.numel() * p.element_size() for p in model.model.parameters())
+    except Exception:
+        return os.path.getsize(ruta) if os.path.isfile(ruta) else 0
+
+
+class ModeloCompartido:
+    """
+    Modelo YOLO cargado y calentado, compartido entre sesiones. Se usa igual que el modelo
+    de ultralytics (model(frames, conf=...)); cada llamada toma el lock de la entrada porque
+    el predictor interno no es seguro entre hilos.
+    """
+
+    def __init__(self, model, device, imgsz: int, tam_bytes: int):
+        self.model = model
+        self.device = device
+        self.imgsz = imgsz
+        self.tam_bytes = tam_bytes
+        self.lock = threading.Lock()
+
+    def __call__(self, frames, **kwargs):
+        kwargs.setdefault("imgsz", self.imgsz)
+        if self.device is not None:
+            kwargs.setdefault("device", self.device)
+        with self.lock:
+            return self.model(frames, **kwargs)
+
+    def calentar(self, lote: int = LOTE_CALENTAMIENTO):
+        """Primera inferencia (fusión de capas, reserva de memoria) sobre un lote negro."""
+        negro = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+        self([negro] * lote, verbose=False)
+
+
+def _cargar(ruta: str, device, imgsz: int) -> ModeloCompartido:
+    from ultralytics import YOLO  # tras la guardia de CUDA de la página
+
+    model = YOLO(ruta)
+    compartido = ModeloCompartido(model, device, imgsz, _tam_modelo(model, ruta))
+    compartido.calentar()
+    return compartido
+
+
+def _desalojar(presupuesto: int):
+    """Saca los menos usados recientemente hasta entrar en el presupuesto (siempre queda uno)."""
+    while len(_modelos) > 1 and sum(m.tam_bytes for m in _modelos.values()) > presupuesto:
+        clave, _ = _modelos.popitem(last=False)
+        print(f"[MODELOS] Desalojado {clave[0]} ({clave[2] or 'auto'}, {clave[3]}px)")
+
+
+def obtener_modelo(ruta: str, device=None, imgsz: int = TAM_ENTRADA_MODELO,
+                   presupuesto_mb: int = PRESUPUESTO_MODELOS_MB):
+    """
+    Modelo listo para inferir: desde memoria si ya se cargó con el mismo archivo, contenido,
+    dispositivo y tamaño de entrada; si no, se carga, se calienta y se registra.
+    Devuelve (modelo, recien_cargado).
+    """
+    clave = (os.path.abspath(ruta) if os.path.isfile(ruta) else ruta, _hash_archivo(ruta), device, imgsz)
+    with _lock:
+        if clave in _modelos:
+            _modelos.move_to_end(clave)
+            return _modelos[clave], False
+        carga = _cargando.setdefault(clave, threading.Lock())
+
+    with carga:
+        with _lock:
+            if clave in _modelos:  # otra sesión lo cargó mientras esperábamos
+                _modelos.move_to_end(clave)
+                return _modelos[clave], False
+        compartido = _cargar(ruta, device, imgsz)
+        with _lock:
+            _modelos[clave] = compartido
+            _cargando.pop(clave, None)
+            _desalojar(presupuesto_mb * 1024 * 1024)
+    return compartido, True
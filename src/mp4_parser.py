@@ -0,0 +1,199 @@
+import struct
+
+import numpy as np
+
+# Lector mínimo de cajas MP4/MOV: solo lee el 'moov' (unos pocos MB),
+# nunca los datos de video ('mdat'), así que no abre ningún decodificador.
+
+CODECS = {
+    "avc1": "h264",
+    "avc3": "h264",
+    "hvc1": "hevc",
+    "hev1": "hevc",
+    "mp4v": "mpeg4",
+    "av01": "av1",
+    "vp09": "vp9",
+    "mjpa": "mjpeg",
+    "jpeg": "mjpeg",
+}
+
+# Cajas contenedoras que hay que recorrer para llegar a las tablas de muestras
+_CONTENEDORES = {"moov", "trak", "mdia", "minf", "stbl", "edts"}
+
+
+def _iterar_cajas(datos: bytes, inicio: int = 0, fin: int = None):
+    """Genera (tipo, inicio_payload, fin_caja) para las cajas de un buffer."""
+    fin = len(datos) if fin is None else fin
+    pos = inicio
+    while pos + 8 <= fin:
+        tam, tipo = struct.unpack(">I4s", datos[pos:pos + 8])
+        cabecera = 8
+        if tam == 1:
+            tam = struct.unpack(">Q", datos[pos + 8:pos + 16])[0]
+            cabecera = 16
+        elif tam == 0:
+            tam = fin - pos
+        if tam < cabecera:
+            break
+        yield tipo.decode("latin-1"), pos + cabecera, min(pos + tam, fin)
+        pos += tam
+
+
+def _leer_moov(ruta: str) -> bytes:
+    """Localiza la caja 'moov' saltando las de nivel superior sin leerlas."""
+    with open(ruta, "rb") as f:
+        f.seek(0, 2)
+        tam_archivo = f.tell()
+        pos = 0
+        while pos + 8 <= tam_archivo:
+            f.seek(pos)
+            cabecera = f.read(16)
+            tam, tipo = struct.unpack(">I4s", cabecera[:8])
+            tam_cab = 8
+            if tam == 1:
+                tam = struct.unpack(">Q", cabecera[8:16])[0]
+                tam_cab = 16
+            elif tam == 0:
+                tam = tam_archivo - pos
+            if tam < tam_cab:
+                break
+            if tipo == b"moov":
+                f.seek(pos + tam_cab)
+                return f.read(tam - tam_cab)
+            pos += tam
+    raise ValueError("El archivo no contiene una caja 'moov' (¿no es MP4/MOV?).")
+
+
+def _tabla(datos: bytes, ini: int, columnas: int, dtype=">u4") -> np.ndarray:
+    """Lee una tabla 'versión/flags + entry_count + entradas' como arreglo."""
+    n = struct.unpack(">I", datos[ini + 4:ini + 8])[0]
+    arr = np.frombuffer(datos, dtype=dtype, count=n * columnas, offset=ini + 8)
+    return arr.reshape(n, columnas) if columnas > 1 else arr
+
+
+def _parsear_pista(datos: bytes, ini: int, fin: int) -> dict:
+    """Extrae las tablas relevantes de una caja 'trak'."""
+    pista = {}
+
+    def recorrer(a, b):
+        for tipo, p, q in _iterar_cajas(datos, a, b):
+            if tipo in _CONTENEDORES:
+                recorrer(p, q)
+            elif tipo == "hdlr":
+                pista["handler"] = datos[p + 8:p + 12].decode("latin-1")
+            elif tipo == "mdhd":
+                version = datos[p]
+                if version == 1:
+                    pista["timescale"], pista["duracion_ts"] = struct.unpack(">IQ", datos[p + 20:p + 32])
+                else:
+                    pista["timescale"], pista["duracion_ts"] = struct.unpack(">II", datos[p + 12:p + 20])
+            elif tipo == "stsd":
+                # Primera entrada: size(4) formato(4) ... ancho/alto en los bytes 32-36
+                entrada = p + 8
+                pista["fourcc"] = datos[entrada + 4:entrada + 8].decode("latin-1")
+                pista["ancho"], pista["alto"] = struct.unpack(">HH", datos[entrada + 32:entrada + 36])
+            elif tipo == "stts":
+                pista["stts"] = _tabla(datos, p, 2)
+            elif tipo == "stss":
+                pista["stss"] = _tabla(datos, p, 1)
+            elif tipo == "ctts":
+                pista["ctts"] = _tabla(datos, p, 2, dtype=">i4")
+            elif tipo == "elst":
+                # Primer segmento no vacío: desplazamiento entre DTS y tiempo presentado
+                version = datos[p]
+                n = struct.unpack(">I", datos[p + 4:p + 8])[0]
+                fmt, paso = (">Qq", 16) if version == 1 else (">Ii", 8)
+                pos = p + 8
+                for _ in range(n):
+                    _, media_time = struct.unpack(fmt, datos[pos:pos + paso])
+                    pos += paso + 4
+                    if media_time != -1:
+                        pista["desfase_edicion"] = media_time
+                        break
+
+    recorrer(ini, fin)
+    return pista
+
+
+def leer_pista_video(ruta: str) -> dict:
+    """
+    Devuelve las tablas de la primera pista de video de un MP4/MOV:
+    timescale, fourcc, ancho/alto y tablas de tiempos y keyframes (stts, stss, ctts).
+    """
+    moov = _leer_moov(ruta)
+    for tipo, p, q in _iterar_cajas(moov):
+        if tipo != "trak":
+            continue
+        pista = _parsear_pista(moov, p, q)
+        if pista.get("handler") != "vide" or "stts" not in pista:
+            continue
+        if not pista.get("timescale") or int(pista["stts"][:, 0].sum()) == 0:
+            # MP4 fragmentado (moof): las muestras están en los fragmentos, no en el moov
+            raise ValueError("La pista de video no tiene muestras en el 'moov' (¿MP4 fragmentado?).")
+        return pista
+    raise ValueError("No se encontró una pista de video en el archivo.")
+
+
+def tabla_de_frames(pista: dict) -> dict:
+    """
+    Expande las tablas de muestras a un arreglo por frame en orden de presentación:
+    PTS en segundos y bandera de keyframe.
+    """
+    timescale = float(pista["timescale"])
+    stts = pista["stts"].astype(np.int64)
+    dts = np.concatenate([[0], np.cumsum(np.repeat(stts[:, 1], stts[:, 0]))])[:-1]
+    n = len(dts)
+
+    pts = dts.copy()
+    if "ctts" in pista:
+        ctts = pista["ctts"].astype(np.int64)
+        pts += np.repeat(ctts[:, 1], ctts[:, 0])[:n]
+    pts -= pista.get("desfase_edicion", 0)
+
+    clave = np.zeros(n, dtype=bool)
+    if "stss" in pista:
+        clave[pista["stss"].astype(np.int64) - 1] = True
+    else:
+        clave[:] = True
+
+    # Orden de decodificación -> orden de presentación (el que numera OpenCV)
+    orden = np.argsort(pts, kind="stable")
+    return {"pts": pts[orden] / timescale, "clave": clave[orden]}
+
+
+def resumir_pista(pista: dict) -> dict:
+    """Calcula duración, fps, número de frames, GOP y bandera VFR a partir de las tablas."""
+    stts = pista["stts"].astype(np.int64)
+    timescale = pista["timescale"]
+    conteos, deltas = stts[:, 0], stts[:, 1]
+    n_frames = int(conteos.sum())
+    duracion = float((conteos * deltas).sum()) / timescale if timescale else 0.0
+
+    # La última entrada suele diferir (frame final recortado): no la contamos para VFR
+    deltas_cuerpo = deltas[:-1] if len(deltas) > 1 else deltas
+    vfr = len(np.unique(deltas_cuerpo)) > 1
+
+    fps = n_frames / duracion if duracion > 0 else 0.0
+    if not vfr and len(deltas_cuerpo) and deltas_cuerpo[0] > 0:
+        fps = timescale / float(deltas_cuerpo[0])
+
+    # Sin 'stss' todos los frames son keyframes (intra)
+    stss = pista.get("stss")
+    if stss is None or len(stss) == 0:
+        gop = 1
+        n_keyframes = n_frames
+    else:
+        n_keyframes = int(len(stss))
+        gop = int(np.median(np.diff(stss))) if len(stss) > 1 else n_frames
+
+    return {
+        "duracion": duracion,
+        "fps": fps,
+        "frames": n_frames,
+        "ancho": int(pista.get("ancho", 0)),
+        "alto": int(pista.get("alto", 0)),
+        "codec": CODECS.get(pista.get("fourcc", ""), pista.get("fourcc", "")),
+        "gop": gop,
+        "keyframes": n_keyframes,
+        "vfr": bool(vfr),
+    }
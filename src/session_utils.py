@@ -11,7 +11,7 @@ def save_session():
         "logged_in", "user", "role", "user_name", 
         "ruta_video_actual", "inicio_recorte", "fin_recorte", 
         "dlc_device_opt", "theme_mode", "zonas_configuradas",
-        "video_en_edicion", "id_raton_actual"
+        "video_en_edicion", "id_raton_actual", "carpeta_vigilada", "rig_calibracion"
     ]
     
     data = {}
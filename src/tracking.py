@@ -0,0 +1,97 @@
+import cv2
+import numpy as np
+
+# Seguimiento ligero entre detecciones: flujo óptico Lucas-Kanade sobre la arena reducida
+ANCHO_SEGUIMIENTO = 320
+RADIO_VENTANA = 24  # px (en la imagen de seguimiento) alrededor del centro para buscar esquinas
+MAX_ESQUINAS = 30
+MIN_PUNTOS = 4
+MAX_ERROR_FB = 1.5  # px de error ida-vuelta tolerado
+PARAMS_LK = dict(
+    winSize=(21, 21),
+    maxLevel=2,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+)
+
+
+class SeguidorFlujo:
+    """
+    Propaga centro/nariz/cola de la última detección con flujo óptico piramidal.
+    Se sigue un puñado de esquinas alrededor del ratón y se aplica el desplazamiento
+    mediano a los puntos clave. 'seguir' devuelve None si el seguimiento no es confiable
+    (pocas esquinas o error ida-vuelta alto): ahí hay que volver a detectar.
+    """
+
+    def __init__(self, recorte=None):
+        self.recorte = recorte
+        self._r = None
+        self._gris = None
+        self._esquinas = None
+        self._claves = None
+
+    def _gris_seguimiento(self, frame):
+        if self.recorte is not None:
+            x0, y0, x1, y1 = self.recorte
+            frame = frame[y0:y1, x0:x1]
+        if self._r is None:
+            self._r = min(1.0, ANCHO_SEGUIMIENTO / frame.shape[1])
+        if self._r < 1.0:
+            frame = cv2.resize(frame, None, fx=self._r, fy=self._r, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def _a_local(self, puntos):
+        x0, y0 = self.recorte[:2] if self.recorte is not None else (0, 0)
+        return (np.asarray(puntos, dtype=np.float32) - (x0, y0)) * self._r
+
+    def _a_frame(self, puntos):
+        x0, y0 = self.recorte[:2] if self.recorte is not None else (0, 0)
+        return puntos / self._r + (x0, y0)
+
+    @property
+    def activo(self) -> bool:
+        return self._claves is not None
+
+    def reiniciar(self, frame, deteccion: dict):
+        """Toma la detección del frame como nueva referencia del seguimiento."""
+        gris = self._gris_seguimiento(frame)
+        self._gris = gris
+        if deteccion["centro"] == (0, 0):
+            self._claves = None  # sin ratón no hay nada que seguir
+            return
+        # Puntos clave en coordenadas locales (float) para no acumular redondeo entre frames
+        self._claves = {
+            c: self._a_local([deteccion[c]])[0] for c in ("centro", "nariz", "cola") if deteccion[c] != (0, 0)
+        }
+        cx, cy = self._a_local([deteccion["centro"]])[0]
+        mascara = np.zeros_like(gris)
+        cv2.circle(mascara, (int(cx), int(cy)), RADIO_VENTANA, 255, -1)
+        esquinas = cv2.goodFeaturesToTrack(gris, MAX_ESQUINAS, 0.01, 3, mask=mascara)
+        centro = np.array([[[cx, cy]]], dtype=np.float32)
+        self._esquinas = centro if esquinas is None else np.concatenate([esquinas.astype(np.float32), centro])
+
+    def actualizar_fondo(self, frame):
+        """Frame sin movimiento: solo se refresca la imagen de referencia."""
+        if self.activo:
+            self._gris = self._gris_seguimiento(frame)
+
+    def seguir(self, frame):
+        """Puntos clave propagados a este frame, o None si hay que volver a detectar."""
+        if not self.activo:
+            return None
+        gris = self._gris_seguimiento(frame)
+        siguientes, estado, _ = cv2.calcOpticalFlowPyrLK(self._gris, gris, self._esquinas, None, **PARAMS_LK)
+        regreso, estado_r, _ = cv2.calcOpticalFlowPyrLK(gris, self._gris, siguientes, None, **PARAMS_LK)
+        error_fb = np.linalg.norm((regreso - self._esquinas).reshape(-1, 2), axis=1)
+        validos = (estado.ravel() == 1) & (estado_r.ravel() == 1) & (error_fb < MAX_ERROR_FB)
+        if validos.sum() < min(MIN_PUNTOS, len(self._esquinas)):
+            self._claves = None
+            return None
+
+        desplazamiento = np.median((siguientes - self._esquinas).reshape(-1, 2)[validos], axis=0)
+        self._esquinas = siguientes[validos].reshape(-1, 1, 2)
+        self._gris = gris
+        propagados = {}
+        for clave, local in self._claves.items():
+            self._claves[clave] = local + desplazamiento
+            propagados[clave] = tuple(int(v) for v in self._a_frame(self._claves[clave]))
+        return propagados
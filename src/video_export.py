@@ -0,0 +1,147 @@
+import os
+import queue
+import subprocess
+import threading
+
+import cv2
+
+from src.video_store import CARPETA_VIDEOS
+
+# Exportación del video anotado (YOLO / clásico): hilo escritor con cola acotada.
+# El bucle de análisis nunca espera al codificador: si la cola está llena el frame no se
+# encola, pero su lugar en la línea de tiempo se rellena repitiendo el frame anterior.
+CARPETA_EXPORTACIONES = os.path.join(CARPETA_VIDEOS, "exports")
+ALTO_EXPORTACION = 720
+PASO_EXPORTACION = 1
+TAM_COLA_EXPORTACION = 8
+
+
+def _ffmpeg_exe() -> str:
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def ruta_exportacion(ruta_video: str, t_inicio: float, t_fin: float) -> str:
+    base = os.path.splitext(os.path.basename(ruta_video))[0]
+    return os.path.join(CARPETA_EXPORTACIONES, f"{base}_{int(t_inicio * 1000)}_{int(t_fin * 1000)}ms_anotado.mp4")
+
+
+class ExportadorVideo:
+    """
+    Escribe en MP4 (H.264, reproducible en el navegador) uno de cada 'paso' frames,
+    reescalados a 'alto' px. Los frames se pasan por una cola de 'tam_cola' elementos a un
+    hilo que reescala y alimenta a ffmpeg; 'enviar' no bloquea nunca, así que la memoria
+    queda acotada aunque el video dure horas. Cada frame que no entra en la cola se cuenta
+    y se escribe como repetición del anterior: el MP4 conserva un frame por cada lugar de
+    la línea de tiempo y dura lo mismo que el rango analizado. Uso como context manager:
+    al salir se vacía la cola y se cierra el archivo.
+    """
+
+    def __init__(self, ruta_salida: str, fps: float, alto: int = ALTO_EXPORTACION,
+                 paso: int = PASO_EXPORTACION, tam_cola: int = TAM_COLA_EXPORTACION):
+        self.ruta = ruta_salida
+        self.fps = fps / max(paso, 1)
+        self.alto = alto
+        self.paso = max(paso, 1)
+        self.escritos = 0
+        self.repetidos = 0
+        self.error = None
+        self._contador = 0
+        self._huecos = 0  # lugares sin frame desde el último que entró en la cola
+        self._ultimo = None  # bytes del último frame escrito (para rellenar huecos)
+        self._tam = None
+        self._proceso = None
+        self._cola = queue.Queue(maxsize=tam_cola)
+        self._hilo = threading.Thread(target=self._escribir, name="exportador-video", daemon=True)
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+
+    def toca(self) -> bool:
+        """True para uno de cada 'paso' frames (llamar una vez por frame analizado)."""
+        toca = self._contador % self.paso == 0
+        self._contador += 1
+        return toca
+
+    def enviar(self, frame_bgr):
+        """
+        Encola el frame ya anotado sin esperar. Si la cola está llena, el lugar queda como
+        hueco y el escritor lo rellena con el frame anterior al escribir el siguiente.
+        """
+        try:
+            self._cola.put_nowait((frame_bgr, self._huecos))
+            self._huecos = 0
+        except queue.Full:
+            self._huecos += 1
+            self.repetidos += 1
+
+    def _abrir(self, ancho: int, alto: int):
+        self._tam = (ancho, alto)
+        cmd = [
+            _ffmpeg_exe(), "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{ancho}x{alto}",
+            "-r", f"{self.fps:.6f}", "-i", "-",
+            "-an", "-c:v", "libx264", "-preset", "ultrafast", "-crf", "23",
+            "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+            self.ruta + ".part.mp4",
+        ]
+        self._proceso = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def _escribir(self):
+        while True:
+            frame, huecos = self._cola.get()
+            if self.error is not None:
+                if frame is None:
+                    break
+                continue  # se sigue vaciando la cola para no trabar al productor
+            try:
+                datos = None
+                if frame is not None:
+                    if self._proceso is None:
+                        h, w = frame.shape[:2]
+                        alto = min(self.alto, h) // 2 * 2  # yuv420p necesita dimensiones pares
+                        self._abrir(int(w * alto / h) // 2 * 2, alto)
+                    if frame.shape[1::-1] != self._tam:
+                        frame = cv2.resize(frame, self._tam, interpolation=cv2.INTER_LINEAR)
+                    datos = frame.tobytes()
+                # Huecos previos: el frame anterior (o este, si aún no se escribió ninguno)
+                relleno = self._ultimo if self._ultimo is not None else datos
+                if relleno is not None:
+                    for _ in range(huecos):
+                        self._proceso.stdin.write(relleno)
+                    self.escritos += huecos
+                if datos is not None:
+                    self._proceso.stdin.write(datos)
+                    self.escritos += 1
+                    self._ultimo = datos
+            except (OSError, ValueError) as e:
+                self.error = str(e)
+            if frame is None:
+                break
+
+    def cerrar(self):
+        """Espera a que se escriba lo encolado y deja el MP4 en 'ruta'."""
+        if not self._hilo.is_alive():
+            return
+        # Los huecos finales se cierran con el último frame (la duración queda completa)
+        self._cola.put((None, self._huecos))
+        self._hilo.join()
+        if self._proceso is None:
+            return
+        try:
+            self._proceso.stdin.close()
+        except OSError:
+            pass
+        stderr = self._proceso.stderr.read().decode(errors="replace")
+        if self._proceso.wait() != 0 and self.error is None:
+            self.error = stderr.strip()[-500:] or f"ffmpeg terminó con código {self._proceso.returncode}"
+        if self.error is None:
+            os.replace(self.ruta + ".part.mp4", self.ruta)
+        elif os.path.exists(self.ruta + ".part.mp4"):
+            os.remove(self.ruta + ".part.mp4")
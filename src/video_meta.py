@@ -0,0 +1,112 @@
+import json
+import os
+import re
+import threading
+
+from src.mp4_parser import leer_pista_video, resumir_pista
+from src.video_store import CARPETA_VIDEOS
+
+# Índice persistente de metadatos: se consulta antes de abrir cualquier decodificador
+INDICE_METADATOS = os.path.join(CARPETA_VIDEOS, "metadata_index.json")
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+_cache_memoria = {}
+_lock = threading.Lock()
+
+
+def clave_video(ruta: str) -> str:
+    """Clave estable del video: hash de contenido si viene del almacén, si no ruta+mtime+tamaño."""
+    base = os.path.splitext(os.path.basename(ruta))[0]
+    if _HASH_RE.match(base):
+        return base
+    st_info = os.stat(ruta)
+    return f"{os.path.abspath(ruta)}|{st_info.st_mtime_ns}|{st_info.st_size}"
+
+
+def _cargar_indice() -> dict:
+    if os.path.exists(INDICE_METADATOS):
+        try:
+            with open(INDICE_METADATOS, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error leyendo índice de metadatos: {e}")
+    return {}
+
+
+def _meta_valida(meta: dict) -> bool:
+    """Una prueba sin frames o sin duración no se guarda: se vuelve a intentar en la próxima consulta."""
+    return bool(meta) and meta.get("frames", 0) > 0 and meta.get("duracion", 0) > 0
+
+
+def guardar_metadatos(ruta: str, meta: dict):
+    """Registra metadatos ya calculados (p. ej. en un proceso de la ingesta por lote)."""
+    if not _meta_valida(meta):
+        return
+    clave = clave_video(ruta)
+    _guardar_entrada(clave, meta)
+    _cache_memoria[clave] = meta
+
+
+def _guardar_entrada(clave: str, meta: dict):
+    os.makedirs(CARPETA_VIDEOS, exist_ok=True)
+    with _lock:
+        indice = _cargar_indice()
+        indice[clave] = meta
+        tmp = f"{INDICE_METADATOS}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(indice, f, indent=4)
+        os.replace(tmp, INDICE_METADATOS)
+
+
+def _probar_con_opencv(ruta: str) -> dict:
+    """Respaldo para contenedores que no son MP4/MOV (abre el decodificador una vez)."""
+    import cv2
+
+    cap = cv2.VideoCapture(ruta)
+    if not cap.isOpened():
+        raise ValueError(f"No se pudo abrir el video: {ruta}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    meta = {
+        "duracion": frames / fps if fps else 0.0,
+        "fps": fps,
+        "frames": frames,
+        "ancho": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "alto": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "codec": "".join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).strip(),
+        "gop": None,
+        "keyframes": None,
+        "vfr": None,
+    }
+    cap.release()
+    return meta
+
+
+def probar_video(ruta: str) -> dict:
+    """Obtiene los metadatos leyendo solo la cabecera del contenedor."""
+    try:
+        return resumir_pista(leer_pista_video(ruta))
+    except Exception as e:
+        print(f"[META] Cabecera MP4 no legible ({e}); usando OpenCV.")
+        return _probar_con_opencv(ruta)
+
+
+def obtener_metadatos(ruta: str) -> dict:
+    """
+    Duración, fps, frames, resolución, codec, GOP y bandera VFR del video.
+    Orden de consulta: memoria -> índice en disco -> lectura de cabecera.
+    """
+    clave = clave_video(ruta)
+    if clave in _cache_memoria:
+        return _cache_memoria[clave]
+
+    meta = _cargar_indice().get(clave)
+    if not _meta_valida(meta):
+        meta = probar_video(ruta)
+        if not _meta_valida(meta):
+            return meta
+        _guardar_entrada(clave, meta)
+
+    _cache_memoria[clave] = meta
+    return meta
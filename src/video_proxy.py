@@ -0,0 +1,139 @@
+import json
+import math
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.video_meta import obtener_metadatos
+from src.video_store import CARPETA_VIDEOS
+
+# Proxies de previsualización (480p, GOP corto) y tira de miniaturas en un solo sprite
+CARPETA_PROXIES = os.path.join(CARPETA_VIDEOS, "proxies")
+ALTO_PROXY = 480
+INTERVALO_MINIATURAS = 5  # segundos entre miniaturas
+ANCHO_MINIATURA = 160
+COLUMNAS_SPRITE = 10
+
+_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="proxy")
+_en_curso = {}
+_lock = threading.Lock()
+
+
+def _ffmpeg_exe() -> str:
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def _base(ruta_video: str) -> str:
+    return os.path.join(CARPETA_PROXIES, os.path.splitext(os.path.basename(ruta_video))[0])
+
+
+def ruta_proxy(ruta_video: str) -> str:
+    return f"{_base(ruta_video)}_{ALTO_PROXY}p.mp4"
+
+
+def ruta_sprite(ruta_video: str) -> str:
+    return f"{_base(ruta_video)}_tira.jpg"
+
+
+def _ejecutar(cmd, ruta_final):
+    """Ejecuta ffmpeg sobre un archivo temporal y lo publica solo si terminó bien."""
+    ruta_tmp = ruta_final + ".part" + os.path.splitext(ruta_final)[1]
+    res = subprocess.run(cmd + [ruta_tmp], capture_output=True, text=True)
+    if res.returncode != 0:
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+        raise RuntimeError(res.stderr.strip()[-500:])
+    os.replace(ruta_tmp, ruta_final)
+
+
+def generar_proxy(ruta_video: str) -> str:
+    """Copia ligera para el reproductor: 480p, GOP de 15 frames, bitrate bajo, faststart."""
+    salida = ruta_proxy(ruta_video)
+    if not os.path.exists(salida):
+        os.makedirs(CARPETA_PROXIES, exist_ok=True)
+        _ejecutar([
+            _ffmpeg_exe(), "-loglevel", "error", "-y",
+            "-i", ruta_video,
+            "-vf", f"scale=-2:{ALTO_PROXY}",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "30",
+            "-g", "15", "-keyint_min", "15",
+            "-pix_fmt", "yuv420p", "-movflags", "+faststart", "-an",
+        ], salida)
+    return salida
+
+
+def generar_tira(ruta_video: str, meta: dict = None) -> str:
+    """Sprite con una miniatura cada INTERVALO_MINIATURAS segundos (decodificando solo keyframes)."""
+    salida = ruta_sprite(ruta_video)
+    if os.path.exists(salida):
+        return salida
+    os.makedirs(CARPETA_PROXIES, exist_ok=True)
+
+    meta = meta or obtener_metadatos(ruta_video)
+    n = max(1, math.ceil(meta["duracion"] / INTERVALO_MINIATURAS))
+    filas = math.ceil(n / COLUMNAS_SPRITE)
+    alto_mini = 2 * round(ANCHO_MINIATURA * meta["alto"] / max(meta["ancho"], 1) / 2)
+
+    # Con GOP conocido y menor al intervalo basta con decodificar keyframes
+    cmd = [_ffmpeg_exe(), "-loglevel", "error", "-y"]
+    if meta.get("gop") and meta["gop"] <= INTERVALO_MINIATURAS * (meta["fps"] or 30):
+        cmd += ["-skip_frame", "nokey"]
+    cmd += [
+        "-i", ruta_video,
+        "-vf", f"fps=1/{INTERVALO_MINIATURAS},scale={ANCHO_MINIATURA}:{alto_mini},"
+               f"tile={COLUMNAS_SPRITE}x{filas}",
+        "-frames:v", "1", "-update", "1", "-q:v", "4",
+    ]
+    _ejecutar(cmd, salida)
+
+    with open(salida + ".json", "w", encoding="utf-8") as f:
+        json.dump({
+            "intervalo": INTERVALO_MINIATURAS,
+            "columnas": COLUMNAS_SPRITE,
+            "n": n,
+            "ancho": ANCHO_MINIATURA,
+            "alto": alto_mini,
+        }, f, indent=4)
+    return salida
+
+
+def _trabajo_previsualizacion(ruta_video: str):
+    try:
+        generar_tira(ruta_video)
+        generar_proxy(ruta_video)
+    except Exception as e:
+        print(f"[PROXY] Error generando previsualizaciones de {ruta_video}: {e}")
+
+
+def programar_previsualizaciones(ruta_video: str):
+    """Lanza en segundo plano el proxy y la tira si aún no existen (idempotente)."""
+    if os.path.exists(ruta_proxy(ruta_video)) and os.path.exists(ruta_sprite(ruta_video)):
+        return
+    with _lock:
+        futuro = _en_curso.get(ruta_video)
+        if futuro is None or futuro.done():
+            _en_curso[ruta_video] = _pool.submit(_trabajo_previsualizacion, ruta_video)
+
+
+def proxy_disponible(ruta_video: str):
+    """Ruta del proxy si ya está listo, si no None."""
+    ruta = ruta_proxy(ruta_video)
+    return ruta if os.path.exists(ruta) else None
+
+
+def miniatura_en(ruta_video: str, t: float):
+    """Recorta del sprite la miniatura más cercana a t (PIL.Image) o None si no hay tira."""
+    ruta = ruta_sprite(ruta_video)
+    if not (os.path.exists(ruta) and os.path.exists(ruta + ".json")):
+        return None
+    from PIL import Image
+
+    with open(ruta + ".json", "r", encoding="utf-8") as f:
+        info = json.load(f)
+    i = min(int(t // info["intervalo"]), info["n"] - 1)
+    fila, col = divmod(i, info["columnas"])
+    x, y = col * info["ancho"], fila * info["alto"]
+    with Image.open(ruta) as sprite:
+        return sprite.crop((x, y, x + info["ancho"], y + info["alto"]))
@@ -0,0 +1,190 @@
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+# Almacén de videos direccionado por contenido (SHA-256)
+CARPETA_VIDEOS = "videos_data"
+CARPETA_ALMACEN = os.path.join(CARPETA_VIDEOS, "store")
+INDICE_INGESTA = os.path.join(CARPETA_VIDEOS, "ingest_index.json")
+
+# Tamaño de bloque para copiar sin cargar el video completo en RAM
+TAM_BLOQUE = 8 * 1024 * 1024
+
+_lock_indice = threading.Lock()
+
+
+def copiar_con_hash(origen, destino, tam_bloque: int = TAM_BLOQUE) -> str:
+    """Copia un flujo binario a otro por bloques y devuelve su SHA-256."""
+    sha = hashlib.sha256()
+    while True:
+        bloque = origen.read(tam_bloque)
+        if not bloque:
+            break
+        sha.update(bloque)
+        destino.write(bloque)
+    return sha.hexdigest()
+
+
+def cargar_indice() -> dict:
+    """Lee el índice de ingesta (videos por hash + registros de experimentos)."""
+    if os.path.exists(INDICE_INGESTA):
+        try:
+            with open(INDICE_INGESTA, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error leyendo índice de ingesta: {e}")
+    return {"videos": {}, "registros": []}
+
+
+def _guardar_indice(indice: dict):
+    """Escritura atómica del índice para no dejarlo a medias."""
+    os.makedirs(CARPETA_VIDEOS, exist_ok=True)
+    tmp = f"{INDICE_INGESTA}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(indice, f, indent=4, ensure_ascii=False)
+    os.replace(tmp, INDICE_INGESTA)
+
+
+def ingestar_video(flujo, extension, id_raton, tratamiento, fecha, responsable, nombre_original=None) -> dict:
+    """
+    Guarda un video en el almacén copiándolo por bloques y calculando su hash.
+    Si el contenido ya existía no se duplica en disco. Devuelve el registro
+    del experimento con la ruta final y la bandera 'duplicado'.
+    """
+    os.makedirs(CARPETA_ALMACEN, exist_ok=True)
+    extension = extension.lower() if extension.startswith(".") else f".{extension.lower()}"
+
+    # Archivo temporal único: dos cargas simultáneas nunca se pisan
+    fd, ruta_tmp = tempfile.mkstemp(suffix=".part", dir=CARPETA_ALMACEN)
+    try:
+        if hasattr(flujo, "seek"):
+            flujo.seek(0)
+        with os.fdopen(fd, "wb") as destino:
+            sha256 = copiar_con_hash(flujo, destino)
+
+        ruta_final = os.path.join(CARPETA_ALMACEN, f"{sha256}{extension}")
+        duplicado = os.path.exists(ruta_final)
+        if duplicado:
+            os.remove(ruta_tmp)
+        else:
+            os.replace(ruta_tmp, ruta_final)
+    except Exception:
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+        raise
+
+    registro = registrar_experimento(sha256, ruta_final, id_raton, tratamiento, fecha, responsable, nombre_original)
+    registro["duplicado"] = duplicado
+    return registro
+
+
+def calcular_hash(ruta: str, tam_bloque: int = TAM_BLOQUE) -> str:
+    """SHA-256 de un archivo leyendo por bloques."""
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+# ioctl FICLONE de Linux: copia por reflink (copy-on-write) en btrfs/XFS sin duplicar bloques
+_FICLONE = 0x40049409
+
+
+def _clonar(origen, destino) -> bool:
+    """Intenta una copia por reflink; False si el sistema de archivos no la admite."""
+    try:
+        import fcntl
+        fcntl.ioctl(destino.fileno(), _FICLONE, origen.fileno())
+        return True
+    except (ImportError, OSError):
+        return False
+
+
+def almacenar_archivo(ruta_origen):
+    """
+    Lleva al almacén un video que ya está en disco, sin tocar el índice (seguro en
+    procesos paralelos). Siempre es una copia independiente (reflink si el sistema de
+    archivos lo permite; nunca un hardlink): si el original se reescribe después, lo
+    almacenado sigue correspondiendo a su hash. Devuelve (sha256, ruta_final, duplicado).
+    """
+    os.makedirs(CARPETA_ALMACEN, exist_ok=True)
+    extension = os.path.splitext(ruta_origen)[1].lower() or ".mp4"
+
+    fd, ruta_tmp = tempfile.mkstemp(suffix=".part", dir=CARPETA_ALMACEN)
+    try:
+        with open(ruta_origen, "rb") as origen, os.fdopen(fd, "wb") as destino:
+            clonado = _clonar(origen, destino)
+            if not clonado:
+                sha256 = copiar_con_hash(origen, destino)
+        if clonado:
+            # El clon es una instantánea: se hashea la copia, no el original que puede cambiar
+            sha256 = calcular_hash(ruta_tmp)
+
+        ruta_final = os.path.join(CARPETA_ALMACEN, f"{sha256}{extension}")
+        duplicado = os.path.exists(ruta_final)
+        if duplicado:
+            os.remove(ruta_tmp)
+        else:
+            os.replace(ruta_tmp, ruta_final)
+    except Exception:
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+        raise
+    return sha256, ruta_final, duplicado
+
+
+def ingestar_archivo(ruta_origen, id_raton, tratamiento, fecha, responsable) -> dict:
+    """Registra un video que ya está en disco (carpeta vigilada) sin pasar por el navegador."""
+    sha256, ruta_final, duplicado = almacenar_archivo(ruta_origen)
+    registro = registrar_experimento(
+        sha256, ruta_final, id_raton, tratamiento, fecha, responsable,
+        os.path.basename(ruta_origen), origen=os.path.abspath(ruta_origen),
+    )
+    registro["duplicado"] = duplicado
+    return registro
+
+
+def registrar_experimento(sha256, ruta_final, id_raton, tratamiento, fecha, responsable,
+                          nombre_original, origen=None, **extra) -> dict:
+    """Añade el video y el registro del experimento al índice (sin duplicar)."""
+    registro = {
+        "id_raton": id_raton,
+        "tratamiento": tratamiento,
+        "fecha": str(fecha),
+        "responsable": responsable,
+        "sha256": sha256,
+        "ruta": ruta_final,
+        "nombre_original": nombre_original,
+        "registrado": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+    if origen:
+        registro["origen"] = origen
+    registro.update(extra)
+
+    with _lock_indice:
+        indice = cargar_indice()
+        indice["videos"].setdefault(sha256, {
+            "ruta": ruta_final,
+            "tamano": os.path.getsize(ruta_final),
+        })
+        previo = next((
+            r for r in indice["registros"]
+            if r["sha256"] == sha256
+            and r["id_raton"] == id_raton
+            and r["tratamiento"] == tratamiento
+            and r["fecha"] == str(fecha)
+            and r["responsable"] == responsable
+        ), None)
+        if previo is None:
+            indice["registros"].append(registro)
+        else:
+            # Mismo experimento: solo se actualizan los campos extra (p. ej. rango de recorte)
+            previo.update(extra)
+            registro = dict(previo)
+        _guardar_indice(indice)
+
+    return registro
@@ -0,0 +1,109 @@
+import json
+import os
+import subprocess
+
+from src.frame_index import obtener_indice_frames
+
+# Recorte sin recodificar: se copian los paquetes desde el keyframe que
+# antecede al inicio solicitado, y se registra cuántos frames sobran al principio.
+SUFIJO_RECORTE = ".trim.json"
+
+
+def _ffmpeg_exe() -> str:
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def _ruta_info(ruta_recorte: str) -> str:
+    return ruta_recorte + SUFIJO_RECORTE
+
+
+def cargar_info_recorte(ruta_recorte: str):
+    """Lee el archivo lateral con el desfase del recorte, si existe."""
+    ruta = _ruta_info(ruta_recorte)
+    if os.path.exists(ruta) and os.path.exists(ruta_recorte):
+        with open(ruta, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return None
+
+
+def _copiar_paquetes(ruta_video, ruta_salida, t_keyframe, duracion) -> bool:
+    """Corta con ffmpeg -c copy arrancando exactamente en el keyframe dado."""
+    cmd = [
+        _ffmpeg_exe(), "-loglevel", "error", "-y",
+        "-ss", f"{t_keyframe:.6f}",
+        "-i", ruta_video,
+        "-t", f"{duracion:.6f}",
+        "-map", "0:v:0", "-c", "copy", "-an",
+        "-avoid_negative_ts", "make_zero",
+        ruta_salida,
+    ]
+    res = subprocess.run(cmd, capture_output=True, text=True)
+    if res.returncode != 0:
+        print(f"[RECORTE] ffmpeg -c copy falló: {res.stderr.strip()}")
+        return False
+    return os.path.exists(ruta_salida) and os.path.getsize(ruta_salida) > 0
+
+
+def _recodificar(ruta_video, ruta_salida, t_inicio, t_fin):
+    """Respaldo: recorte físico recodificando con libx264 (comportamiento anterior)."""
+    from moviepy.editor import VideoFileClip
+
+    original_clip = VideoFileClip(ruta_video)
+    subclip = original_clip.subclip(t_inicio, t_fin)
+    subclip.write_videofile(ruta_salida, codec="libx264", audio=False)
+    original_clip.close()
+
+
+def recortar_video(ruta_video, t_inicio, t_fin, carpeta_destino, permitir_copia=True) -> dict:
+    """
+    Recorta [t_inicio, t_fin] del video. Intenta copiar paquetes entre los keyframes
+    que encierran el rango; si no se puede cortar limpio, recodifica.
+
+    Devuelve la info del recorte: ruta, modo ('copia' o 'recodificado'),
+    frame_base (frame del original que corresponde al frame 0 del recorte) y
+    offset_frames (frames del recorte anteriores al inicio solicitado).
+    """
+    base_name = os.path.splitext(os.path.basename(ruta_video))[0]
+    nombre = f"{base_name}_trimmed_{int(t_inicio * 1000)}_{int(t_fin * 1000)}ms.mp4"
+    ruta_salida = os.path.join(carpeta_destino, nombre)
+
+    info = cargar_info_recorte(ruta_salida)
+    if info is not None:
+        print(f"[RECORTE] Usando recorte existente: {ruta_salida}")
+        return info
+
+    indice = obtener_indice_frames(ruta_video)
+    n_inicio = indice.frame_en_tiempo(t_inicio)
+    n_fin = indice.frame_en_tiempo(t_fin)
+    k = indice.keyframe_previo(n_inicio)
+
+    modo = None
+    if permitir_copia and indice.exacto:
+        t_keyframe = float(indice.pts[k])
+        duracion = float(indice.pts[n_fin]) - t_keyframe + 1e-3
+        if _copiar_paquetes(ruta_video, ruta_salida, t_keyframe, duracion):
+            # Validación: el recorte debe contener al menos los frames pedidos
+            obtenidos = len(obtener_indice_frames(ruta_salida))
+            if obtenidos >= n_fin - k:
+                modo = "copia"
+            else:
+                print(f"[RECORTE] Corte incompleto ({obtenidos} frames); se recodifica.")
+
+    if modo is None:
+        _recodificar(ruta_video, ruta_salida, t_inicio, t_fin)
+        modo = "recodificado"
+        k = n_inicio
+
+    info = {
+        "ruta": ruta_salida,
+        "modo": modo,
+        "inicio_solicitado": t_inicio,
+        "fin_solicitado": t_fin,
+        "frame_base": int(k),
+        "offset_frames": int(n_inicio - k),
+        "inicio_real": float(indice.pts[k]),
+    }
+    with open(_ruta_info(ruta_salida), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=4)
+    return info
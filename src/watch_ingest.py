@@ -0,0 +1,198 @@
+import csv
+import datetime
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from src.frame_index import obtener_indice_frames
+from src.video_meta import obtener_metadatos
+from src.video_proxy import programar_previsualizaciones
+from src.video_store import ingestar_archivo
+
+# Ingesta masiva: los videos que caen en una carpeta se registran sin pasar por el navegador
+EXTENSIONES_VIDEO = (".mp4", ".mov", ".avi")
+ESPERA_ESTABLE = 2.0  # segundos sin cambio de tamaño para considerar terminada la copia
+
+
+def leer_lateral(ruta_video: str) -> dict:
+    """
+    Metadatos del experimento desde un archivo lateral con el mismo nombre
+    (<video>.json o <video>.csv con encabezados). Si no hay, valores por defecto.
+    """
+    base = os.path.splitext(ruta_video)[0]
+    datos = {}
+    if os.path.exists(base + ".json"):
+        with open(base + ".json", "r", encoding="utf-8") as f:
+            datos = json.load(f)
+    elif os.path.exists(base + ".csv"):
+        with open(base + ".csv", "r", encoding="utf-8-sig", newline="") as f:
+            filas = list(csv.DictReader(f))
+        datos = filas[0] if filas else {}
+
+    fecha_archivo = datetime.date.fromtimestamp(os.path.getmtime(ruta_video))
+    return {
+        "id_raton": datos.get("id_raton") or os.path.basename(base),
+        "tratamiento": datos.get("tratamiento") or "Sin asignar",
+        "fecha": datos.get("fecha") or str(fecha_archivo),
+        "responsable": datos.get("responsable") or "Carpeta vigilada",
+    }
+
+
+def _esperar_estable(ruta: str, espera: float = ESPERA_ESTABLE):
+    """Bloquea hasta que el archivo deja de crecer (la copia a la carpeta terminó)."""
+    tam_previo = -1
+    while True:
+        tam = os.path.getsize(ruta)
+        if tam == tam_previo and tam > 0:
+            return
+        tam_previo = tam
+        time.sleep(espera)
+
+
+class _Manejador(FileSystemEventHandler):
+    def __init__(self, vigilante):
+        self.vigilante = vigilante
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.vigilante.encolar(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.vigilante.encolar(event.dest_path)
+
+
+class VigilanteCarpeta:
+    """Observa una carpeta y registra cada video nuevo en un pool en segundo plano."""
+
+    def __init__(self, carpeta: str, max_workers: int = None):
+        self.carpeta = os.path.abspath(carpeta)
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+        self._observer = None
+        self._pool = None
+        self._vistos = set()
+        self._futuros = {}  # ruta -> Future aún no terminado
+        self._estado = {}
+        self._lock = threading.Lock()
+
+    @property
+    def activo(self) -> bool:
+        return self._observer is not None and self._observer.is_alive()
+
+    def iniciar(self):
+        if self.activo:
+            return
+        os.makedirs(self.carpeta, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ingesta")
+        self._observer = Observer()
+        self._observer.schedule(_Manejador(self), self.carpeta, recursive=False)
+        self._observer.start()
+        # Barrido inicial: lo que ya estaba en la carpeta antes de arrancar
+        for nombre in sorted(os.listdir(self.carpeta)):
+            self.encolar(os.path.join(self.carpeta, nombre))
+
+    def detener(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        # Lo que quedó en cola no se procesó: se olvida para que el próximo inicio lo retome
+        with self._lock:
+            for ruta, futuro in list(self._futuros.items()):
+                if futuro.cancelled():
+                    self._vistos.discard(ruta)
+                    self._futuros.pop(ruta)
+                    self._estado[ruta]["Estado"] = "Cancelado"
+
+    def encolar(self, ruta: str):
+        if not ruta.lower().endswith(EXTENSIONES_VIDEO) or ".part" in os.path.basename(ruta):
+            return
+        ruta = os.path.abspath(ruta)
+        with self._lock:
+            if ruta in self._vistos or self._pool is None:
+                return
+            self._vistos.add(ruta)
+            self._estado[ruta] = {"Archivo": os.path.basename(ruta), "Estado": "En cola"}
+            futuro = self._pool.submit(self._procesar, ruta)
+            self._futuros[ruta] = futuro
+        futuro.add_done_callback(lambda f, ruta=ruta: self._terminado(ruta, f))
+
+    def _terminado(self, ruta: str, futuro):
+        with self._lock:
+            if not futuro.cancelled() and self._futuros.get(ruta) is futuro:
+                self._futuros.pop(ruta)
+
+    def _actualizar(self, ruta, **campos):
+        with self._lock:
+            self._estado[ruta].update(campos)
+
+    def _procesar(self, ruta: str):
+        try:
+            self._actualizar(ruta, Estado="Esperando fin de copia")
+            _esperar_estable(ruta)
+
+            self._actualizar(ruta, Estado="Registrando")
+            datos = leer_lateral(ruta)
+            registro = ingestar_archivo(ruta, **datos)
+
+            self._actualizar(ruta, Estado="Indexando", **{"ID": datos["id_raton"]})
+            meta = obtener_metadatos(registro["ruta"])
+            obtener_indice_frames(registro["ruta"])
+            programar_previsualizaciones(registro["ruta"])
+
+            self._actualizar(
+                ruta,
+                Estado="Duplicado" if registro["duplicado"] else "Listo",
+                **{"Duración (s)": round(meta["duracion"], 1), "Ruta": registro["ruta"]},
+            )
+        except Exception as e:
+            self._actualizar(ruta, Estado=f"Error: {e}")
+
+    def estado(self) -> list:
+        """Filas de estado por archivo para mostrar en la interfaz."""
+        with self._lock:
+            return [dict(v) for v in self._estado.values()]
+
+
+# Un solo vigilante por proceso: los reruns de Streamlit lo reutilizan
+_vigilante = None
+
+
+def vigilante_actual():
+    """Vigilante del proceso (o None). Solo consulta: nunca detiene ni reemplaza nada."""
+    return _vigilante
+
+
+def iniciar_vigilancia(carpeta: str) -> VigilanteCarpeta:
+    """Arranca la vigilancia de 'carpeta'; si el vigilante del proceso miraba otra, la reemplaza."""
+    global _vigilante
+    if _vigilante is None or _vigilante.carpeta != os.path.abspath(carpeta):
+        if _vigilante is not None:
+            _vigilante.detener()
+        _vigilante = VigilanteCarpeta(carpeta)
+    _vigilante.iniciar()
+    return _vigilante
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingesta de videos desde una carpeta vigilada.")
+    parser.add_argument("carpeta", help="Carpeta donde se depositan los videos")
+    args = parser.parse_args()
+
+    vigilante = iniciar_vigilancia(args.carpeta)
+    print(f"Vigilando {vigilante.carpeta} (Ctrl+C para salir)...")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        vigilante.detener()
@@ -0,0 +1,361 @@
+import math
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+import psutil
+
+from src.tracking import SeguidorFlujo
+# Pipeline productor/consumidor para el motor por frame (YOLO):
+# decodificación -> inferencia -> anotación/UI, con colas acotadas (backpressure).
+TAM_COLA_FRAMES = 8
+TAM_COLA_RESULTADOS = 8
+ESPERA_COLA = 0.1  # s; cada cuánto revisan los hilos la señal de parada
+# Inferencia por lotes: N frames por llamada al modelo
+TAM_ENTRADA_MODELO = 640
+FRACCION_MEMORIA_LOTE = 0.25
+MAX_LOTE = 32
+# Compuerta de movimiento: diferencia en gris reducido dentro de la arena
+ANCHO_COMPUERTA = 160
+UMBRAL_PIXEL = 12  # niveles de gris para considerar que un píxel cambió
+UMBRAL_MOVIMIENTO = 0.002  # fracción de píxeles de la arena que deben cambiar
+REFRESCO_K = 15  # inferencia forzada cada K frames aunque no haya movimiento
+
+_FIN = object()
+
+
+def tam_lote_auto(alto: int, ancho: int, tam_entrada: int = TAM_ENTRADA_MODELO) -> int:
+    """
+    Frames por llamada al modelo según la RAM disponible: cada frame del lote ocupa el
+    BGR decodificado, su copia anotada y el tensor float32 de entrada del modelo.
+    """
+    por_frame = alto * ancho * 3 * 2 + tam_entrada * tam_entrada * 3 * 4
+    disponible = psutil.virtual_memory().available * FRACCION_MEMORIA_LOTE
+    return int(min(max(disponible // por_frame, 1), MAX_LOTE))
+
+
+def _deteccion_de_resultado(res) -> dict:
+    """Centro (nariz si es modelo pose), nariz y cola de un resultado de ultralytics."""
+    deteccion = {"centro": (0, 0), "nariz": (0, 0), "cola": (0, 0), "resultado": res}
+    if len(res.boxes) > 0:
+        # Centro por defecto (bounding box)
+        box = res.boxes[0].xywh.cpu().numpy()[0]
+        deteccion["centro"] = (int(box[0]), int(box[1]))
+
+        # Si es modelo Pose, extraemos puntos clave
+        if hasattr(res, "keypoints") and res.keypoints is not None:
+            try:
+                pts = res.keypoints.xy.cpu().numpy()[0]  # [N, 2]
+                if len(pts) > 0:
+                    # Asumimos 0 como nariz (depende del entrenamiento)
+                    nariz = (int(pts[0][0]), int(pts[0][1]))
+                    deteccion["nariz"] = nariz
+                    # Usamos la nariz como centro principal si está disponible
+                    if nariz != (0, 0):
+                        deteccion["centro"] = nariz
+                    # Cola: último punto en modelos de ratón completos
+                    if len(pts) > 16:
+                        deteccion["cola"] = (int(pts[16][0]), int(pts[16][1]))
+            except Exception:
+                pass
+    return deteccion
+
+
+def detectar_yolo(model, frames: list, confianza: float) -> list:
+    """Inferencia YOLO de un lote de frames en una sola llamada al modelo."""
+    return [_deteccion_de_resultado(res) for res in model(frames, conf=confianza, verbose=False)]
+
+
+def detectar_simulado(frames: list) -> list:
+    """Simulación de ratón moviéndose en círculo (sin modelo)."""
+    detecciones = []
+    for frame in frames:
+        h, w = frame.shape[:2]
+        t = time.time()
+        centro = (int(w / 2 + 150 * math.cos(t * 1.5)), int(h / 2 + 100 * math.sin(t * 1.5)))
+        detecciones.append({"centro": centro, "nariz": (0, 0), "cola": (0, 0), "resultado": None})
+    return detecciones
+
+
+def anotar_deteccion(frame, deteccion: dict):
+    """Dibujo de ultralytics sobre el frame completo (pegado en su región si hubo recorte)."""
+    res = deteccion["resultado"]
+    if res is None:
+        return frame
+    dibujo = res.plot()
+    region = deteccion.get("region")
+    if region is None:
+        return dibujo
+    x0, y0, x1, y1 = region
+    if dibujo.shape[:2] != (y1 - y0, x1 - x0):
+        dibujo = cv2.resize(dibujo, (x1 - x0, y1 - y0))
+    frame[y0:y1, x0:x1] = dibujo
+    return frame
+
+
+class PipelineVideo:
+    """
+    Decodifica en un hilo, infiere en otro y entrega (n_frame, tiempo_s, frame, deteccion)
+    al hilo principal, que anota y actualiza la interfaz. Las colas acotadas frenan al
+    productor si un consumidor se atrasa; el rendimiento tiende al de la etapa más lenta.
+    'detectar' recibe una lista de hasta 'tam_lote' frames y devuelve una detección por frame;
+    con 'mapa_zonas' la zona de todo el lote se asigna de forma vectorizada
+    (deteccion['x'], ['y'] en resolución original y deteccion['zona']).
+    'recorte' (x0, y0, x1, y1) limita la inferencia a la arena y 'lado_modelo' reduce ese
+    recorte al tamaño de entrada del modelo; las detecciones vuelven al frame completo.
+    Con 'refresco_k' > 0 se omite el detector en frames sin movimiento respecto al último
+    frame inferido (se reutiliza esa posición, deteccion['reutilizado'] = True), forzando
+    una inferencia cada 'refresco_k' frames.
+    Con 'intervalo_deteccion' N > 1 (modo híbrido) el detector corre cada N frames y en medio
+    un seguidor de flujo óptico propaga la posición (deteccion['seguido'] = True); si el
+    seguimiento falla se vuelve a detectar en ese mismo frame.
+    Usar como contexto: al salir (fin, error o rerun de Streamlit) se detienen los hilos.
+    """
+
+    def __init__(self, cap, pts, n_inicio: int, t_fin: float, detectar, tam_lote: int = 1,
+                 mapa_zonas=None, escala: float = 1.0, recorte=None, lado_modelo: int = None,
+                 refresco_k: int = 0, intervalo_deteccion: int = 1,
+                 tam_frames: int = TAM_COLA_FRAMES, tam_resultados: int = TAM_COLA_RESULTADOS):
+        self.cap = cap
+        self.pts = pts
+        self.n_inicio = n_inicio
+        self.t_fin = t_fin
+        self.detectar = detectar
+        self.tam_lote = max(1, int(tam_lote))
+        self.mapa_zonas = mapa_zonas
+        self.escala = escala
+        self.recorte = recorte
+        self.lado_modelo = lado_modelo
+        self.refresco_k = refresco_k
+        self._mascara_arena = None
+        self._gris_referencia = None
+        self._ultima = None
+        self._sin_inferir = 0
+        self.intervalo_deteccion = max(1, int(intervalo_deteccion))
+        self._seguidor = SeguidorFlujo(recorte) if self.intervalo_deteccion > 1 else None
+        self._desde_deteccion = self.intervalo_deteccion
+        self.inferencias = 0
+        self.seguidos = 0
+        # La cola de frames debe poder contener al menos un lote completo más el siguiente
+        self._frames = queue.Queue(maxsize=max(tam_frames, 2 * self.tam_lote))
+        self._resultados = queue.Queue(maxsize=tam_resultados)
+        self._parar = threading.Event()
+        self._hilos = [
+            threading.Thread(target=self._decodificar, name="pipeline-decodificar", daemon=True),
+            threading.Thread(target=self._inferir, name="pipeline-inferir", daemon=True),
+        ]
+
+    def __enter__(self):
+        for hilo in self._hilos:
+            hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.detener()
+        return False
+
+    def _poner(self, cola: queue.Queue, item) -> bool:
+        """put bloqueante que respeta la señal de parada (backpressure sin deadlock)."""
+        while not self._parar.is_set():
+            try:
+                cola.put(item, timeout=ESPERA_COLA)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _obtener(self, cola: queue.Queue):
+        while not self._parar.is_set():
+            try:
+                return cola.get(timeout=ESPERA_COLA)
+            except queue.Empty:
+                continue
+        return _FIN
+
+    def _decodificar(self):
+        n = self.n_inicio
+        try:
+            while not self._parar.is_set() and n < len(self.pts):
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                # PTS exacto del frame según el índice (no la estimación de OpenCV)
+                tiempo_s = float(self.pts[n])
+                if tiempo_s > self.t_fin:
+                    break
+                if not self._poner(self._frames, (n, tiempo_s, frame)):
+                    return
+                n += 1
+        except Exception as e:
+            self._poner(self._frames, e)
+        self._poner(self._frames, _FIN)
+
+    def _siguiente_lote(self):
+        """Hasta tam_lote frames; el marcador de fin/error se devuelve aparte."""
+        lote = []
+        while len(lote) < self.tam_lote:
+            item = self._obtener(self._frames)
+            if item is _FIN or isinstance(item, Exception):
+                return lote, item
+            lote.append(item)
+        return lote, None
+
+    def _preparar(self, frame):
+        """Recorte a la arena (vista, sin copia) y reducción opcional; devuelve (imagen, r)."""
+        if self.recorte is not None:
+            x0, y0, x1, y1 = self.recorte
+            frame = frame[y0:y1, x0:x1]
+        r = 1.0
+        if self.lado_modelo:
+            r = min(1.0, self.lado_modelo / max(frame.shape[:2]))
+            if r < 1.0:
+                frame = cv2.resize(frame, None, fx=r, fy=r, interpolation=cv2.INTER_AREA)
+        return frame, r
+
+    def _a_frame_completo(self, deteccion: dict, r: float):
+        """Lleva los puntos detectados en el recorte reducido al frame decodificado completo."""
+        x0, y0 = self.recorte[:2] if self.recorte is not None else (0, 0)
+        for clave in ("centro", "nariz", "cola"):
+            px, py = deteccion[clave]
+            if (px, py) != (0, 0):  # (0, 0) = no detectado
+                deteccion[clave] = (int(px / r + x0), int(py / r + y0))
+        deteccion["region"] = self.recorte
+
+    def _asignar_zonas(self, detecciones: list):
+        centros = np.array([d["centro"] for d in detecciones], dtype=np.float64).reshape(-1, 2)
+        # (0, 0) = no detectado: NaN para que cuente como NO_DETECTADO y no como el píxel (0, 0)
+        centros[(centros == 0).all(axis=1)] = np.nan
+        # Detección en coordenadas del video decodificado -> resolución original
+        xs = np.floor(centros[:, 0] * self.escala)
+        ys = np.floor(centros[:, 1] * self.escala)
+        for d, x, y, zona in zip(detecciones, xs, ys, self.mapa_zonas.zonas_de_trayectoria(xs, ys)):
+            d["x"], d["y"], d["zona"] = float(x), float(y), zona
+
+    def _gris_compuerta(self, frame):
+        """Arena en gris reducido a ANCHO_COMPUERTA (y su máscara, calculada una vez)."""
+        h, w = frame.shape[:2]
+        x0, y0, x1, y1 = self.recorte if self.recorte is not None else (0, 0, w, h)
+        r = ANCHO_COMPUERTA / max(x1 - x0, 1)
+        tam = (ANCHO_COMPUERTA, max(int((y1 - y0) * r), 1))
+        gris = cv2.cvtColor(cv2.resize(frame[y0:y1, x0:x1], tam, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        if self._mascara_arena is None:
+            if self.mapa_zonas is not None and self.mapa_zonas.etiquetas.any():
+                etiquetas = (self.mapa_zonas.etiquetas > 0).astype(np.uint8)
+                etiquetas = cv2.resize(etiquetas, (w, h), interpolation=cv2.INTER_NEAREST)[y0:y1, x0:x1]
+                mascara = cv2.resize(etiquetas, tam, interpolation=cv2.INTER_NEAREST)
+                # Un poco más amplia: el cuerpo del ratón sobresale del borde de las zonas
+                mascara = cv2.dilate(mascara, np.ones((5, 5), np.uint8))
+            else:
+                mascara = np.ones(tam[::-1], np.uint8)
+            self._mascara_arena = mascara.astype(bool)
+        return cv2.GaussianBlur(gris, (3, 3), 0)
+
+    def _hay_movimiento(self, gris) -> bool:
+        diferencia = cv2.absdiff(gris, self._gris_referencia)[self._mascara_arena]
+        return diferencia.size > 0 and (diferencia > UMBRAL_PIXEL).mean() >= UMBRAL_MOVIMIENTO
+
+    def _inferir_frames(self, frames: list) -> list:
+        """Una llamada al detector para los frames dados (recorte/reducción incluidos)."""
+        preparados = [self._preparar(frame) for frame in frames]
+        detecciones = self.detectar([imagen for imagen, _ in preparados])
+        if self.recorte is not None or self.lado_modelo:
+            for deteccion, (_, r) in zip(detecciones, preparados):
+                self._a_frame_completo(deteccion, r)
+        self.inferencias += len(frames)
+        return detecciones
+
+    def _planear(self, lote: list) -> list:
+        """Decisión por frame: 'reusar' (sin movimiento), 'seguir' (flujo óptico) o 'detectar'."""
+        decisiones = []
+        for _, _, frame in lote:
+            if self.refresco_k > 0:
+                gris = self._gris_compuerta(frame)
+                forzado = self._gris_referencia is None or self._sin_inferir + 1 >= self.refresco_k
+                if not forzado and not self._hay_movimiento(gris):
+                    self._sin_inferir += 1
+                    decisiones.append("reusar")
+                    continue
+                self._gris_referencia = gris
+                self._sin_inferir = 0
+            if self._seguidor is not None and self._desde_deteccion + 1 < self.intervalo_deteccion:
+                self._desde_deteccion += 1
+                decisiones.append("seguir")
+            else:
+                self._desde_deteccion = 0
+                decisiones.append("detectar")
+        return decisiones
+
+    def _detectar_lote(self, lote: list) -> list:
+        """Detecciones del lote; solo los frames planeados para 'detectar' van juntos al modelo."""
+        decisiones = self._planear(lote)
+        seleccion = [frame for (_, _, frame), d in zip(lote, decisiones) if d == "detectar"]
+        nuevas = iter(self._inferir_frames(seleccion) if seleccion else [])
+
+        # Recorrido en orden: seguimiento y reutilización dependen del frame anterior
+        detecciones = []
+        for (_, _, frame), decision in zip(lote, decisiones):
+            if decision == "reusar":
+                if self._seguidor is not None:
+                    self._seguidor.actualizar_fondo(frame)
+                detecciones.append({**self._ultima, "resultado": None, "reutilizado": True, "seguido": False})
+                continue
+            if decision == "seguir":
+                puntos = self._seguidor.seguir(frame)
+                if puntos is not None:
+                    self._ultima = {**self._ultima, **puntos, "resultado": None}
+                    self.seguidos += 1
+                    detecciones.append({**self._ultima, "reutilizado": False, "seguido": True})
+                    continue
+                # Seguimiento perdido: se vuelve a detectar en este frame
+                deteccion = self._inferir_frames([frame])[0]
+                self._desde_deteccion = 0
+            else:
+                deteccion = next(nuevas)
+            if self._seguidor is not None:
+                self._seguidor.reiniciar(frame, deteccion)
+            self._ultima = deteccion
+            detecciones.append({**deteccion, "reutilizado": False, "seguido": False})
+        return detecciones
+
+    def _inferir(self):
+        while True:
+            lote, marcador = self._siguiente_lote()
+            if lote:
+                try:
+                    detecciones = self._detectar_lote(lote)
+                    if self.mapa_zonas is not None:
+                        self._asignar_zonas(detecciones)
+                except Exception as e:
+                    self._poner(self._resultados, e)
+                    return
+                for (n, tiempo_s, frame), deteccion in zip(lote, detecciones):
+                    if not self._poner(self._resultados, (n, tiempo_s, frame, deteccion)):
+                        return
+            if marcador is not None:
+                self._poner(self._resultados, marcador)
+                return
+
+    def __iter__(self):
+        while True:
+            item = self._obtener(self._resultados)
+            if item is _FIN:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def detener(self):
+        """Cancelación limpia: señal de parada, vaciado de colas y espera de los hilos."""
+        self._parar.set()
+        for cola in (self._frames, self._resultados):
+            while True:
+                try:
+                    cola.get_nowait()
+                except queue.Empty:
+                    break
+        for hilo in self._hilos:
+            if hilo.is_alive():
+                hilo.join(timeout=5)
+        self.cap.release()
@@ -0,0 +1,201 @@
+import math
+
+import cv2
+import numpy as np
+
+# Mapa rasterizado de zonas: cada píxel guarda el índice de su zona (0 = fuera)
+FUERA_LABERINTO = "Fuera del Laberinto"
+NO_DETECTADO = "No detectado"
+MARGEN_ARENA = 0.1  # fracción del tamaño de la arena que se agrega alrededor de las zonas
+
+
+def poligono_de_zona(zona: dict) -> np.ndarray:
+    """Vértices (N, 2) de la zona: 'puntos' si es un polígono, si no las 4 esquinas del rectángulo."""
+    if zona.get("puntos"):
+        return np.asarray(zona["puntos"], dtype=np.float64)
+    x, y, w, h = zona["left"], zona["top"], zona["width"], zona["height"]
+    return np.array([[x, y], [x + w, y], [x + w, y + h], [x, y + h]], dtype=np.float64)
+
+
+def caja_arena(zonas: list, ancho: int, alto: int, margen: float = MARGEN_ARENA):
+    """
+    Caja (x0, y0, x1, y1) que contiene todas las zonas más un margen relativo a su tamaño,
+    recortada al frame. El ratón solo puede estar aquí dentro: es la región a analizar.
+    """
+    if not zonas:
+        return 0, 0, int(ancho), int(alto)
+    pts = np.concatenate([poligono_de_zona(z) for z in zonas])
+    (x0, y0), (x1, y1) = pts.min(axis=0), pts.max(axis=0)
+    mx, my = (x1 - x0) * margen, (y1 - y0) * margen
+    return (
+        max(int(x0 - mx), 0), max(int(y0 - my), 0),
+        min(int(np.ceil(x1 + mx)), int(ancho)), min(int(np.ceil(y1 + my)), int(alto)),
+    )
+
+
+def zona_desde_poligono(nombre: str, puntos) -> dict:
+    """
+    Zona guardable a partir de sus vértices. Conserva left/top/width/height
+    (caja envolvente) para el código que aún trabaja con rectángulos.
+    """
+    pts = np.asarray(puntos, dtype=np.float64)
+    x0, y0 = pts.min(axis=0)
+    x1, y1 = pts.max(axis=0)
+    return {
+        "Nombre Zona": nombre,
+        "left": int(x0),
+        "top": int(y0),
+        "width": int(round(x1 - x0)),
+        "height": int(round(y1 - y0)),
+        "puntos": np.round(pts).astype(int).tolist(),
+    }
+
+
+def escalar_zona(zona: dict, factor: float) -> dict:
+    """Copia de la zona con coordenadas multiplicadas por factor (caja y vértices)."""
+    escalada = {**zona}
+    for campo in ("left", "top", "width", "height"):
+        escalada[campo] = zona[campo] * factor
+    if zona.get("puntos"):
+        escalada["puntos"] = (np.asarray(zona["puntos"], dtype=np.float64) * factor).tolist()
+    return escalada
+
+
+def poligono_de_objeto_canvas(obj: dict) -> np.ndarray:
+    """
+    Vértices en coordenadas del canvas de un objeto de fabric.js (st_canvas):
+    rectángulo con giro/escala (modo transform) o trazo de polígono (modo polygon).
+    """
+    sx, sy = obj.get("scaleX", 1.0), obj.get("scaleY", 1.0)
+    if obj.get("type") == "path":
+        # El trazo guarda sus puntos absolutos al dibujarse; al moverlo solo cambian left/top
+        pts = np.array([seg[1:3] for seg in obj["path"] if seg[0] in ("M", "L")], dtype=np.float64)
+        locales = (pts - pts.min(axis=0)) * (sx, sy)
+    else:
+        w, h = obj["width"] * sx, obj["height"] * sy
+        locales = np.array([[0, 0], [w, 0], [w, h], [0, h]], dtype=np.float64)
+
+    # fabric.js gira alrededor del origen del objeto (esquina superior izquierda)
+    ang = math.radians(obj.get("angle", 0.0))
+    rot = np.array([[math.cos(ang), -math.sin(ang)], [math.sin(ang), math.cos(ang)]])
+    return locales @ rot.T + (obj["left"], obj["top"])
+
+
+class MapaZonas:
+    """
+    Compila 'zonas_configuradas' en una matriz de etiquetas a la resolución del video.
+    Asignar zona a un punto es un solo acceso al arreglo; a una trayectoria, un gather.
+    Prioridad en solapes: gana la primera zona de la lista (como el antiguo checar_zona).
+    Acepta rectángulos (left/top/width/height) y polígonos ('puntos'); el número de
+    vértices no afecta el costo por frame.
+    """
+
+    def __init__(self, zonas: list, ancho: int, alto: int):
+        self.ancho, self.alto = int(ancho), int(alto)
+        self.nombres = np.array([FUERA_LABERINTO] + [z["Nombre Zona"] for z in zonas] + [NO_DETECTADO], dtype=object)
+        self.idx_no_detectado = len(self.nombres) - 1
+        self.etiquetas = np.zeros((self.alto, self.ancho), dtype=np.uint16)
+        # Se pintan en orden inverso para que las primeras sobrescriban a las últimas
+        for i in range(len(zonas) - 1, -1, -1):
+            self._pintar(zonas[i], i + 1)
+
+    def _pintar(self, zona: dict, etiqueta: int):
+        if zona.get("puntos"):
+            # Polígono / rectángulo girado: el costo de los vértices se paga solo aquí
+            pts = np.round(np.asarray(zona["puntos"], dtype=np.float64)).astype(np.int32)
+            cv2.fillPoly(self.etiquetas, [pts], int(etiqueta))
+            return
+        # Límites inclusivos, igual que la comparación x_min <= x <= x_max
+        x0, y0 = max(int(zona["left"]), 0), max(int(zona["top"]), 0)
+        x1 = min(int(zona["left"] + zona["width"]), self.ancho - 1)
+        y1 = min(int(zona["top"] + zona["height"]), self.alto - 1)
+        if x1 >= x0 and y1 >= y0:
+            self.etiquetas[y0:y1 + 1, x0:x1 + 1] = etiqueta
+
+    def indices(self, xs, ys) -> np.ndarray:
+        """Índice de zona para arreglos de coordenadas (NaN -> No detectado)."""
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        validos = np.isfinite(xs) & np.isfinite(ys)
+        xi = np.floor(np.where(validos, xs, -1)).astype(np.int64)
+        yi = np.floor(np.where(validos, ys, -1)).astype(np.int64)
+        dentro = (xi >= 0) & (xi < self.ancho) & (yi >= 0) & (yi < self.alto)
+
+        resultado = np.zeros(xs.shape, dtype=np.int64)
+        resultado[dentro] = self.etiquetas[yi[dentro], xi[dentro]]
+        resultado[~validos] = self.idx_no_detectado
+        return resultado
+
+    def zonas_de_trayectoria(self, xs, ys) -> np.ndarray:
+        """Nombre de zona para cada punto de una trayectoria completa (vectorizado)."""
+        return self.nombres[self.indices(xs, ys)]
+
+
+def objeto_canvas_de_zona(zona: dict, factor: float, color: str) -> dict:
+    """Zona (resolución original) como trazo de fabric.js para 'initial_drawing' de st_canvas."""
+    pts = poligono_de_zona(zona) / factor
+    x0, y0 = pts.min(axis=0)
+    x1, y1 = pts.max(axis=0)
+    return {
+        "type": "path",
+        "left": float(x0),
+        "top": float(y0),
+        "width": float(x1 - x0),
+        "height": float(y1 - y0),
+        "fill": color,
+        "stroke": "#ffffff",
+        "strokeWidth": 2,
+        "path": [["M", *pts[0].tolist()]] + [["L", *p] for p in pts[1:].tolist()] + [["z"]],
+    }
+
+
+class CapaZonas:
+    """
+    Capa estática de zonas (contornos + nombres) rasterizada una sola vez. Por frame solo se
+    mezclan los píxeles con trazo (misma apariencia que dibujar sobre una copia y hacer
+    addWeighted 0.6/0.4 de todo el frame); la zona activa se pinta en verde y el resto en azul.
+    """
+
+    OPACIDAD = 0.6
+    COLOR_ACTIVA = (0, 255, 0)
+    COLOR_INACTIVA = (255, 0, 0)
+
+    def __init__(self, zonas_dibujo: list):
+        """zonas_dibujo: lista de (nombre, vértices int32) en coordenadas del frame a anotar."""
+        self.zonas_dibujo = zonas_dibujo
+        self.nombres = [nombre for nombre, _ in zonas_dibujo]
+        self._forma = None
+
+    def _rasterizar(self, alto: int, ancho: int):
+        # Cobertura (0-255, el texto puede venir suavizado) y zona dueña de cada píxel;
+        # se pinta en el mismo orden que antes: la última zona queda encima.
+        duenos = np.zeros((alto, ancho), dtype=np.uint8)
+        cobertura = np.zeros((alto, ancho), dtype=np.uint8)
+        trazo = np.zeros((alto, ancho), dtype=np.uint8)
+        for i, (nombre, pts) in enumerate(self.zonas_dibujo, start=1):
+            trazo[:] = 0
+            cv2.polylines(trazo, [pts], True, 255, 2)
+            p1 = pts.min(axis=0)
+            cv2.putText(trazo, nombre, (int(p1[0]), int(p1[1]) - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, 255, 1)
+            pinta = trazo > 0
+            duenos[pinta] = i
+            cobertura[pinta] = trazo[pinta]
+        self._ys, self._xs = np.nonzero(duenos)
+        self._zona_pixel = duenos[self._ys, self._xs].astype(np.intp) - 1
+        self._alfa = (cobertura[self._ys, self._xs].astype(np.float32) / 255.0 * self.OPACIDAD)[:, None]
+        self._forma = (alto, ancho)
+
+    def componer(self, frame: np.ndarray, zona_activa: str) -> np.ndarray:
+        """Mezcla la capa sobre 'frame' (in situ) resaltando 'zona_activa'."""
+        if self._forma != frame.shape[:2]:
+            self._rasterizar(*frame.shape[:2])
+        if len(self._ys) == 0:
+            return frame
+        colores = np.array(
+            [self.COLOR_ACTIVA if n == zona_activa else self.COLOR_INACTIVA for n in self.nombres],
+            dtype=np.float32,
+        )
+        base = frame[self._ys, self._xs].astype(np.float32)
+        mezcla = base + self._alfa * (colores[self._zona_pixel] - base)
+        frame[self._ys, self._xs] = np.clip(mezcla + 0.5, 0, 255).astype(np.uint8)
+        return frame
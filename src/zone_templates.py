@@ -0,0 +1,172 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+
+import cv2
+import numpy as np
+
+from src.background import fondo_mediana
+from src.video_meta import clave_video
+from src.video_store import CARPETA_VIDEOS
+from src.zonas import poligono_de_zona, zona_desde_poligono
+
+# Plantillas de zonas: configuración + fondo de referencia del equipo de grabación
+CARPETA_PLANTILLAS = os.path.join(CARPETA_VIDEOS, "plantillas_zonas")
+CARPETA_ALINEACIONES = os.path.join(CARPETA_VIDEOS, "cache", "alineaciones")
+N_PUNTOS_ORB = 1500
+RAZON_LOWE = 0.75
+MIN_INLIERS = 25
+UMBRAL_RANSAC = 5.0  # px (en el fondo reducido): tolerancia de RANSAC para contar inliers
+# Calidad exigida a una alineación en caché (más estricta que RANSAC, que ya acota el residuo)
+UMBRAL_RESIDUO = 1.5  # px, residuo mediano de los inliers
+MIN_FRACCION_INLIERS = 0.3  # inliers / coincidencias que pasan la razón de Lowe
+
+_orb = None
+
+
+def _detectar(gris: np.ndarray):
+    global _orb
+    if _orb is None:
+        _orb = cv2.ORB_create(nfeatures=N_PUNTOS_ORB)
+    return _orb.detectAndCompute(gris, None)
+
+
+def _nombre_archivo(nombre: str) -> str:
+    return re.sub(r"[^\w\-]+", "_", nombre.strip()) or "plantilla"
+
+
+def guardar_plantilla(nombre: str, zonas: list, fondo_bgr: np.ndarray, escala: float) -> str:
+    """
+    Guarda las zonas (resolución original) con el fondo de referencia en que se dibujaron.
+    'escala' lleva coordenadas del fondo a la resolución original (ver fondo_mediana).
+    """
+    os.makedirs(CARPETA_PLANTILLAS, exist_ok=True)
+    base = os.path.join(CARPETA_PLANTILLAS, _nombre_archivo(nombre))
+    cv2.imwrite(base + ".png", fondo_bgr)
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump({
+            "nombre": nombre,
+            "zonas": zonas,
+            "escala": escala,
+            "creada": datetime.datetime.now().isoformat(timespec="seconds"),
+        }, f, indent=4, ensure_ascii=False)
+    return base + ".json"
+
+
+def listar_plantillas() -> list:
+    """Plantillas disponibles (diccionarios con nombre, zonas, escala y ruta del fondo)."""
+    if not os.path.isdir(CARPETA_PLANTILLAS):
+        return []
+    plantillas = []
+    for archivo in sorted(os.listdir(CARPETA_PLANTILLAS)):
+        if not archivo.endswith(".json"):
+            continue
+        ruta = os.path.join(CARPETA_PLANTILLAS, archivo)
+        with open(ruta, "r", encoding="utf-8") as f:
+            plantilla = json.load(f)
+        plantilla["fondo"] = os.path.splitext(ruta)[0] + ".png"
+        plantilla["version"] = os.path.getmtime(ruta)
+        plantillas.append(plantilla)
+    return plantillas
+
+
+def alinear_plantilla(plantilla: dict, fondo_bgr: np.ndarray, escala: float):
+    """
+    Homografía fondo de la plantilla -> fondo del video nuevo (ORB + RANSAC).
+    Devuelve (H, residuo_mediano_px, n_inliers, fraccion_inliers) o None si no hay
+    suficientes coincidencias.
+    """
+    ref = cv2.imread(plantilla["fondo"], cv2.IMREAD_GRAYSCALE)
+    if ref is None:
+        return None
+    kp_ref, des_ref = _detectar(ref)
+    kp_new, des_new = _detectar(cv2.cvtColor(fondo_bgr, cv2.COLOR_BGR2GRAY))
+    if des_ref is None or des_new is None or len(kp_ref) < MIN_INLIERS or len(kp_new) < MIN_INLIERS:
+        return None
+
+    pares = cv2.BFMatcher(cv2.NORM_HAMMING).knnMatch(des_ref, des_new, k=2)
+    buenos = [p[0] for p in pares if len(p) == 2 and p[0].distance < RAZON_LOWE * p[1].distance]
+    if len(buenos) < MIN_INLIERS:
+        return None
+
+    src = np.float32([kp_ref[m.queryIdx].pt for m in buenos])
+    dst = np.float32([kp_new[m.trainIdx].pt for m in buenos])
+    H, inliers = cv2.findHomography(src, dst, cv2.RANSAC, UMBRAL_RANSAC)
+    if H is None or int(inliers.sum()) < MIN_INLIERS:
+        return None
+
+    sel = inliers.ravel().astype(bool)
+    proyectados = cv2.perspectiveTransform(src[sel].reshape(-1, 1, 2), H).reshape(-1, 2)
+    residuo = float(np.median(np.linalg.norm(proyectados - dst[sel], axis=1)))
+    return H, residuo, int(sel.sum()), float(sel.sum()) / len(buenos)
+
+
+def transformar_zonas(zonas: list, H: np.ndarray, escala_ref: float, escala_nueva: float) -> list:
+    """Lleva las zonas de la plantilla al video nuevo (vía las coordenadas de ambos fondos)."""
+    alineadas = []
+    for zona in zonas:
+        pts = poligono_de_zona(zona) / escala_ref
+        pts = cv2.perspectiveTransform(pts.reshape(-1, 1, 2), H).reshape(-1, 2) * escala_nueva
+        alineadas.append(zona_desde_poligono(zona["Nombre Zona"], pts))
+    return alineadas
+
+
+def _ruta_alineacion(ruta_video: str, t_inicio: float, t_fin: float) -> str:
+    base = hashlib.sha1(clave_video(ruta_video).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CARPETA_ALINEACIONES, f"{base}_{int(t_inicio * 1000)}_{int(t_fin * 1000)}.json")
+
+
+def _alineacion_buena(residuo: float, fraccion: float) -> bool:
+    return residuo <= UMBRAL_RESIDUO and fraccion >= MIN_FRACCION_INLIERS
+
+
+def zonas_desde_plantilla(ruta_video: str, t_inicio: float, t_fin: float):
+    """
+    Alinea la mejor plantilla al fondo mediana del video y devuelve
+    {plantilla, residuo, inliers, fraccion, zonas} o None si ninguna cumple
+    UMBRAL_RESIDUO / MIN_FRACCION_INLIERS. El resultado (también "ninguna sirve") se
+    cachea por video y solo se recalcula si cambió el conjunto de plantillas
+    (alta, baja o edición de cualquiera).
+    """
+    plantillas = listar_plantillas()
+    if not plantillas:
+        return None
+    versiones = {p["nombre"]: p["version"] for p in plantillas}
+
+    ruta_cache = _ruta_alineacion(ruta_video, t_inicio, t_fin)
+    if os.path.exists(ruta_cache):
+        with open(ruta_cache, "r", encoding="utf-8") as f:
+            previa = json.load(f)
+        if previa.get("plantillas") == versiones:
+            if previa.get("plantilla") is None:
+                return None
+            if _alineacion_buena(previa["residuo"], previa.get("fraccion", 0.0)):
+                return previa
+
+    fondo, escala = fondo_mediana(ruta_video, t_inicio, t_fin)
+    mejor = None
+    for plantilla in plantillas:
+        resultado = alinear_plantilla(plantilla, fondo, escala)
+        if resultado is None:
+            continue
+        H, residuo, inliers, fraccion = resultado
+        if not _alineacion_buena(residuo, fraccion):
+            continue  # no se precarga una alineación dudosa
+        if mejor is None or (inliers, -residuo) > (mejor["inliers"], -mejor["residuo"]):
+            mejor = {
+                "plantilla": plantilla["nombre"],
+                "version": plantilla["version"],
+                "residuo": residuo,
+                "inliers": inliers,
+                "fraccion": fraccion,
+                "plantillas": versiones,
+                "H": H.tolist(),
+                "zonas": transformar_zonas(plantilla["zonas"], H, plantilla["escala"], escala),
+            }
+
+    os.makedirs(CARPETA_ALINEACIONES, exist_ok=True)
+    with open(ruta_cache, "w", encoding="utf-8") as f:
+        json.dump(mejor or {"plantilla": None, "plantillas": versiones}, f, indent=4, ensure_ascii=False)
+    return mejor